@@ -15,3 +15,6 @@ import cflib.fasta
 import cflib.vcf
 import cflib.cf
 import cflib.gp
+import cflib.bam
+import cflib.bootstrap
+import cflib.patterns
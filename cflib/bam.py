@@ -0,0 +1,189 @@
+#!/usr/bin/env python
+
+"""cflib.bam
+==============
+
+This module provides functions to count bases in aligned reads
+(BAM or CRAM files) and to write these counts in counts format.
+
+The reads of one BAM file or of a group of BAM files make up one
+population.  At each position, the bases of the reads of a population
+that pass the base quality and mapping quality thresholds are
+counted.  Unmapped, secondary, QC failed and duplicate reads are
+ignored.  No variant calling is involved, so that the counts of all
+alleles are kept.
+
+Index files need to be provided for all BAM files. They can be
+created from the terminal with $(samtools index "bam-file.bam").
+
+A code example is::
+
+  import cflib.bam as bam
+  import cflib.seqbase as sb
+
+  bamFnM = [["pop1-a.bam", "pop1-b.bam"], ["pop2.bam"]]
+  rgL = [sb.Region("chr1", 1, 1000000)]
+  bam.bam_to_cf(bamFnM, "name-of-outfile", rgL=rgL, nProc=4)
+
+Objects
+-------
+Functions:
+  - :func:`get_regions()`, get regions of all chromosomes of a BAM
+    file
+  - :func:`split_regions()`, split regions into chunks
+  - :func:`count_region()`, count bases of populations in a region
+  - :func:`bam_to_cf()`, convert BAM files to counts format
+
+----
+
+"""
+
+__docformat__ = 'restructuredtext'
+
+import functools
+import logging
+import multiprocessing
+import os
+
+import numpy as np
+import pysam as ps
+
+import cflib.seqbase as sb
+import cflib.cf as cf
+
+# Flags of reads that are ignored (unmapped, secondary, QC fail and
+# duplicate).
+ignoreFlags = 0x4 | 0x100 | 0x200 | 0x400
+
+
+def get_regions(bamFN, refFN=None):
+    """Get the regions of all chromosomes in the header of a BAM file.
+
+    :param str bamFN: Name of the BAM (or CRAM) file.
+    :param str refFN: Optional; name of the reference fasta file
+      (needed for CRAM files).
+
+    :rtype: [Region]
+
+    """
+    with ps.AlignmentFile(bamFN, reference_filename=refFN) as af:
+        return [sb.Region(chrom, 1, length)
+                for (chrom, length) in zip(af.references, af.lengths)]
+
+
+def split_regions(rgL, chunkSize=1000000):
+    """Split the regions in *rgL* into chunks of length *chunkSize*.
+
+    :param [Region] rgL: List of regions.
+    :param int chunkSize: Optional; maximum length of the chunks.
+
+    :rtype: [Region]
+
+    """
+    chunkL = []
+    for rg in rgL:
+        for start in range(rg.start, rg.end + 1, chunkSize):
+            end = min(start + chunkSize - 1, rg.end)
+            chunkL.append(sb.Region(rg.chrom, start + 1, end + 1))
+    return chunkL
+
+
+def count_region(rg, bamFnM, minBQ=13, minMQ=0, refFN=None):
+    """Count the bases of the populations in region *rg*.
+
+    The bases are counted with
+    :func:`pysam.AlignmentFile.count_coverage`.
+
+    :param Region rg: :class:`Region <cflib.seqbase.Region>` object.
+    :param bamFnM: *bamFnM[p]* is the list of the BAM (or CRAM) files
+      of population *p*.
+    :param int minBQ: Optional; minimum base quality.
+    :param int minMQ: Optional; minimum mapping quality.
+    :param str refFN: Optional; name of the reference fasta file
+      (needed for CRAM files).
+
+    :rtype: (rg, cA), where cA is an array of shape (n, nPop, 4) with
+      the counts of A, C, G and T of the n positions in *rg*.
+
+    """
+    def read_filter(read):
+        return (read.flag & ignoreFlags == 0 and
+                read.mapping_quality >= minMQ)
+
+    cA = np.zeros((rg.end - rg.start + 1, len(bamFnM), 4), dtype=np.int64)
+    for (p, bamFnL) in enumerate(bamFnM):
+        for bamFN in bamFnL:
+            with ps.AlignmentFile(bamFN, reference_filename=refFN) as af:
+                covT = af.count_coverage(contig=rg.chrom, start=rg.start,
+                                         stop=rg.end + 1,
+                                         quality_threshold=minBQ,
+                                         read_callback=read_filter)
+            cA[:, p, :] += np.array(covT, dtype=np.int64).T
+    return (rg, cA)
+
+
+def bam_to_cf(bamFnM, countsFN, rgL=None, nameL=None, minBQ=13, minMQ=0,
+              refFN=None, nProc=1, chunkSize=1000000, skipEmpty=False):
+    """Convert BAM (or CRAM) files to counts format.
+
+    The regions are split into chunks of length *chunkSize* (cf.
+    :func:`split_regions`) which are counted by a pool of *nProc*
+    processes (cf. :func:`count_region`).  The counts are written in
+    order with a :class:`CFWriter <cflib.cf.CFWriter>`.
+
+    :param bamFnM: *bamFnM[p]* is the list of the BAM (or CRAM) files
+      of population *p*.
+    :param str countsFN: Name of the counts file.
+    :param [Region] rgL: Optional; list of regions.  Defaults to all
+      chromosomes in the header of the first BAM file.
+    :param [str] nameL: Optional; names of the populations.  Defaults
+      to the name of the first BAM file of each population (without
+      ending).
+    :param int minBQ: Optional; minimum base quality.
+    :param int minMQ: Optional; minimum mapping quality.
+    :param str refFN: Optional; name of the reference fasta file
+      (needed for CRAM files).
+    :param int nProc: Optional; number of processes.
+    :param int chunkSize: Optional; length of the chunks.
+    :param Boolean skipEmpty: Optional; do not write positions where
+      no base is counted.
+
+    """
+    if nameL is None:
+        nameL = [os.path.basename(bamFnL[0]).split('.', maxsplit=1)[0]
+                 for bamFnL in bamFnM]
+    elif len(nameL) != len(bamFnM):
+        raise cf.CountsFormatWriterError("`nameL` is not valid.")
+    if rgL is None:
+        rgL = get_regions(bamFnM[0][0], refFN)
+    chunkL = split_regions(rgL, chunkSize)
+    logging.debug("Number of Populations: %s", len(bamFnM))
+    logging.debug("Number of chunks: %s", len(chunkL))
+
+    cfw = cf.CFWriter([], countsFN, nameL=nameL)
+    cfw.write_HLn()
+
+    count = functools.partial(count_region, bamFnM=bamFnM, minBQ=minBQ,
+                              minMQ=minMQ, refFN=refFN)
+    pool = multiprocessing.Pool(nProc) if nProc > 1 else None
+    try:
+        if pool is not None:
+            resI = pool.imap(count, chunkL)
+        else:
+            resI = map(count, chunkL)
+        for (rg, cA) in resI:
+            posA = np.arange(rg.start + 1, rg.end + 2)
+            if skipEmpty is True:
+                keep = cA.any(axis=(1, 2))
+                posA = posA[keep]
+                cA = cA[keep]
+            cfw.write_Lns(rg.chrom, posA, cA)
+        if pool is not None:
+            pool.close()
+            pool.join()
+    finally:
+        # Stop the workers if an error occurred; the counts file is
+        # closed in any case.
+        if pool is not None:
+            pool.terminate()
+        cfw.close()
@@ -0,0 +1,247 @@
+#!/usr/bin/env python
+
+"""cflib.bootstrap
+====================
+
+This module provides functions to create bootstrap replicates of
+counts format files.
+
+The counts file is read once.  For each replicate, the sites are drawn
+with replacement, i.e., each site gets a weight (the number of times
+it has been drawn) from a multinomial distribution.  Each replicate
+uses its own random number generator spawned from one seed so that
+the replicates are reproducible and do not depend on the number of
+processes.
+
+Instead of single sites, windows of a given length on the chromosomes
+can be drawn (block bootstrap).  All sites of a window get the weight
+of the window.
+
+The replicates can either be written as full counts files (each site
+is repeated according to its weight) or only as weights.  In the
+latter case, the distinct site patterns are written once to a counts
+file and the pattern weights of each replicate are written to a
+weights file with one line per replicate.
+
+A code example is::
+
+  import cflib.bootstrap as bs
+
+  bs.bootstrap_cf("name-of-counts-file", "prefix-of-replicates",
+                  nRep=100, seed=42, nProc=4)
+
+Objects
+-------
+Functions:
+  - :func:`get_windows()`, get the windows of the sites
+  - :func:`get_site_weights()`, draw the site weights of a replicate
+  - :func:`write_replicate()`, write a replicate in counts format
+  - :func:`bootstrap_cf()`, create bootstrap replicates of a counts
+    file
+
+----
+
+"""
+
+__docformat__ = 'restructuredtext'
+
+import logging
+import multiprocessing
+
+import numpy as np
+
+import cflib.seqbase as sb
+import cflib.cf as cf
+import cflib.patterns as pt
+
+# Data of the counts file that is shared with the worker processes.
+sharedD = {}
+
+
+def get_windows(chromA, posA, windowSize):
+    """Get the windows of the sites.
+
+    The chromosomes are split into windows of length *windowSize*
+    starting at position 1.
+
+    :param chromA: Chromosome names of the sites.
+    :param posA: 1-based positions of the sites.
+    :param int windowSize: Length of the windows.
+
+    :rtype: (int nWin, numpy.ndarray winA), the number of windows that
+      contain sites and the index of the window of each site.
+
+    """
+    chromI = np.unique(chromA, return_inverse=True)[1].reshape(-1)
+    posI = (np.asarray(posA, dtype=np.int64) - 1) // windowSize
+    (winL, winA) = np.unique(chromI * (posI.max() + 1) + posI,
+                             return_inverse=True)
+    return (len(winL), winA.reshape(-1))
+
+
+def get_site_weights(nSites, rng, winA=None, nWin=None):
+    """Draw the site weights of a bootstrap replicate.
+
+    The weights of the *nSites* sites are multinomially distributed
+    with equal probabilities.  If the windows of the sites are given
+    (cf. :func:`get_windows`), *nWin* windows are drawn instead and
+    each site gets the weight of its window.
+
+    :param int nSites: Number of sites.
+    :param rng: :class:`numpy.random.Generator`.
+    :param winA: Optional; index of the window of each site.
+    :param int nWin: Optional; number of windows.
+
+    :rtype: numpy.ndarray
+
+    """
+    if winA is None:
+        return np.bincount(rng.integers(0, nSites, nSites),
+                           minlength=nSites)
+    winW = np.bincount(rng.integers(0, nWin, nWin), minlength=nWin)
+    return winW[winA]
+
+
+def write_replicate(fn, nameL, chromA, posA, countsA, weights,
+                    blockSize=100000):
+    """Write a bootstrap replicate in counts format.
+
+    Each site is written as many times as given by its weight.  The
+    file can additionally be gzipped (indicated by a .gz file ending).
+
+    :param str fn: Name of the counts file.
+    :param [str] nameL: Names of the populations.
+    :param chromA: Chromosome names of the sites.
+    :param posA: 1-based positions of the sites.
+    :param countsA: Counts of the sites (array of shape (nSites,
+      nPop, 4)).
+    :param weights: Weights of the sites.
+    :param int blockSize: Optional; number of lines written at once.
+
+    """
+    nPop = len(nameL)
+    indA = np.repeat(np.arange(len(weights)), weights)
+    lnFmt = "%s %d " + ' '.join(["%d,%d,%d,%d"] * nPop)
+    with sb.gz_open(fn, mode='w') as fo:
+        fo.write("COUNTSFILE NPOP " + str(nPop) + " NSITES " +
+                 str(len(indA)) + '\n')
+        fo.write("CHROM POS " + ' '.join(nameL) + '\n')
+        for start in range(0, len(indA), blockSize):
+            iA = indA[start:start+blockSize]
+            cL = countsA[iA].reshape(len(iA), 4 * nPop).tolist()
+            fo.write('\n'.join(lnFmt % (c, p, *cnt) for (c, p, cnt) in
+                               zip(chromA[iA].tolist(), posA[iA].tolist(),
+                                   cL)) + '\n')
+
+
+def init_worker(dataD):
+    """Initialize a worker process with the data of the counts file."""
+    sharedD.update(dataD)
+
+
+def bootstrap_replicate(args):
+    """Create bootstrap replicate *i* with seed sequence *ss*.
+
+    The data is taken from *sharedD* (cf. :func:`init_worker`).  If
+    the replicate file name *fn* is None, the pattern weights are
+    returned; otherwise, the replicate is written to *fn* (cf.
+    :func:`write_replicate`).
+
+    :param args: Tuple (i, ss, fn).
+
+    :rtype: (i, numpy.ndarray or str)
+
+    """
+    (i, ss, fn) = args
+    d = sharedD
+    weights = get_site_weights(len(d["countsA"]), np.random.default_rng(ss),
+                               d["winA"], d["nWin"])
+    if fn is None:
+        return (i, np.bincount(d["patA"], weights=weights,
+                               minlength=d["nPat"]).astype(np.int64))
+    write_replicate(fn, d["nameL"], d["chromA"], d["posA"], d["countsA"],
+                    weights)
+    return (i, fn)
+
+
+def bootstrap_cf(countsFN, outPrefix, nRep=100, seed=None,
+                 windowSize=None, weightsOnly=False, nProc=1,
+                 compress=False):
+    """Create bootstrap replicates of a counts format file.
+
+    The counts file is read once (cf. :func:`read_cf_array
+    <cflib.cf.read_cf_array>`).  The replicates are created by a pool
+    of *nProc* processes.  Replicate *i* (starting at 1) is written to
+    *outPrefix*\\_i.cf.
+
+    If *weightsOnly* is True, the distinct site patterns (cf.
+    :class:`PatternCounter <cflib.patterns.PatternCounter>`) are
+    written to *outPrefix*\\_patterns.cf (the first site of each
+    pattern) and the pattern weights of the replicates to
+    *outPrefix*\\_weights.txt, one line per replicate.
+
+    :param str countsFN: Name of the counts file.
+    :param str outPrefix: Prefix of the output files.
+    :param int nRep: Optional; number of replicates.
+    :param int seed: Optional; seed of the random number generators.
+    :param int windowSize: Optional; draw windows of this length
+      instead of single sites (block bootstrap, cf.
+      :func:`get_windows`).
+    :param Boolean weightsOnly: Optional; only write the distinct
+      patterns and their weights.
+    :param int nProc: Optional; number of processes.
+    :param Boolean compress: Optional; gzip the counts files.
+
+    """
+    (nameL, chromA, posA, countsA) = cf.read_cf_array(countsFN,
+                                                      positions=True)
+    logging.debug("Number of Populations: %s", len(nameL))
+    logging.debug("Number of Sites: %s", len(countsA))
+    dataD = {"nameL": nameL, "chromA": chromA, "posA": posA,
+             "countsA": countsA, "winA": None, "nWin": None}
+    if windowSize is not None:
+        (dataD["nWin"], dataD["winA"]) = get_windows(chromA, posA,
+                                                     windowSize)
+        logging.debug("Number of Windows: %s", dataD["nWin"])
+    ending = ".cf.gz" if compress is True else ".cf"
+    if weightsOnly is True:
+        pc = pt.PatternCounter(len(nameL))
+        dataD["patA"] = pc.add_block(chromA, posA, countsA)
+        dataD["nPat"] = len(pc.weightL)
+        logging.debug("Number of Patterns: %s", dataD["nPat"])
+        write_replicate(outPrefix + "_patterns" + ending, nameL,
+                        np.array(pc.chromL), np.array(pc.posL),
+                        pc.get_counts(),
+                        np.ones(dataD["nPat"], dtype=np.int64))
+        fnL = [None] * nRep
+    else:
+        fnL = [outPrefix + "_" + str(i+1) + ending for i in range(nRep)]
+    argL = list(zip(range(nRep), np.random.SeedSequence(seed).spawn(nRep),
+                    fnL))
+
+    if nProc > 1:
+        pool = multiprocessing.Pool(nProc, initializer=init_worker,
+                                    initargs=(dataD,))
+    else:
+        pool = None
+        init_worker(dataD)
+    try:
+        if pool is not None:
+            resI = pool.imap(bootstrap_replicate, argL)
+        else:
+            resI = map(bootstrap_replicate, argL)
+        if weightsOnly is True:
+            with open(outPrefix + "_weights.txt", 'w') as fo:
+                for (i, patW) in resI:
+                    fo.write(' '.join(map(str, patW.tolist())) + '\n')
+        else:
+            for (i, fn) in resI:
+                logging.info("Replicate %s written to %s.", i+1, fn)
+        if pool is not None:
+            pool.close()
+            pool.join()
+    finally:
+        # Stop the workers if an error occurred.
+        if pool is not None:
+            pool.terminate()
+        sharedD.clear()
@@ -90,11 +90,17 @@ Exception Classes:
 
 Functions:
   - :func:`interpret_cf_line()`, get data of a line in counts format
+  - :func:`iter_cf_blocks()`, read the counts of a counts file block
+    by block
+  - :func:`read_cf_array()`, read the counts of a counts file into an
+    array
   - :func:`faseq_append_base_of_cfS()`, append CFStream line to FaSeq
   - :func:`cf_to_fasta()`, convert counts file to fasta file
   - :func:`write_cf_from_MFaStream()`, write counts file using the
     given MFaStream and CFWriter
   - :func:`fasta_to_cf()`, convert fasta to counts format
+  - :func:`sync_to_cf()`, convert PoPoolation2 sync file to counts
+    format
 
 ----
 
@@ -117,6 +123,8 @@ import numpy as np
 dna = {'a': 0, 'c': 1, 'g': 2, 't': 3, 'u': 3, 'r': 5, 'y': 6, 's': 7,
        'w': 8, 'k': 9, 'm': 10, 'b': 11, 'd': 12, 'h': 13, 'v': 14,
        'n': 15, '.': 16, '-': 17, '*': 18}
+# Indices of the bases that are counted at invariant sites.
+ind4 = {'a': 0, 'c': 1, 'g': 2, 't': 3, 'u': 3}
 ind2dna = ['a', 'c', 'g', 't', 'u', 'r', 'y', 's', 'w', 'k',
            'm', 'b', 'd', 'h', 'v', 'n', '.', '-', '*']
 
@@ -260,6 +268,86 @@ class CFStream():
         self.fo.close()
 
 
+def iter_cf_blocks(cfStr, blockSize=100000, positions=False):
+    """Read the counts of a :class:`CFStream` block by block.
+
+    Generator that returns the counts of the next (at most)
+    *blockSize* lines as an array of shape (n, nIndiv, 4) with
+    unsigned integers (uint32), starting with the current line of
+    *cfStr*.  The lines of each block are parsed at once; chromosome
+    names and positions are only stored if *positions* is True.
+
+    :param CFStream cfStr: The :class:`CFStream`.
+    :param int blockSize: Optional; number of lines parsed at once.
+    :param Boolean positions: Optional; also return the chromosome
+      names and the positions of the lines in a tuple (chromA, posA,
+      countsA).
+
+    :raises: :class:`NotACountsFormatFileError`
+
+    """
+    nIndiv = cfStr.nIndiv
+    nF = 2 + 4 * nIndiv
+
+    def parse_block(lnL):
+        fL = ''.join(lnL).replace(',', ' ').split()
+        nLn = sum(1 for ln in lnL if not ln.isspace())
+        if len(fL) != nLn * nF:
+            raise NotACountsFormatFileError(
+                "Line doesn't fit nr. of species.")
+        fA = np.array(fL).reshape(-1, nF)
+        countsA = fA[:, 2:].astype(np.uint32).reshape(-1, nIndiv, 4)
+        if positions is True:
+            return (fA[:, 0], fA[:, 1].astype(np.int64), countsA)
+        return countsA
+
+    lnL = [cfStr.chrom + ' ' + cfStr.pos + ' ' +
+           ' '.join(','.join(map(str, c)) for c in cfStr.countsL) + '\n']
+    for ln in cfStr.fo:
+        lnL.append(ln)
+        if len(lnL) == blockSize:
+            yield parse_block(lnL)
+            lnL = []
+    if len(lnL) > 0:
+        yield parse_block(lnL)
+
+
+def read_cf_array(CFFileName, blockSize=100000, positions=False):
+    """Read the counts of a counts format file into a NumPy array.
+
+    The file is read in blocks of *blockSize* lines (cf.
+    :func:`iter_cf_blocks`).  The counts are stored in an array of
+    shape (nSites, nIndiv, 4) with unsigned integers (uint16 if all
+    counts fit, uint32 otherwise); chromosome names and positions are
+    only stored if *positions* is True.
+
+    :param str CFFileName: Counts format file name to be read.
+    :param int blockSize: Optional; number of lines parsed at once.
+    :param Boolean positions: Optional; also return the chromosome
+      names and the positions of the sites.
+
+    :raises: :class:`NotACountsFormatFileError`
+
+    :rtype: ([str] indivL, numpy.ndarray countsA), or ([str] indivL,
+      numpy.ndarray chromA, numpy.ndarray posA, numpy.ndarray countsA)
+      if *positions* is True.
+
+    """
+    cfStr = CFStream(CFFileName)
+    blockL = list(iter_cf_blocks(cfStr, blockSize, positions))
+    cfStr.close()
+    if positions is True:
+        chromA = np.concatenate([b[0] for b in blockL])
+        posA = np.concatenate([b[1] for b in blockL])
+        blockL = [b[2] for b in blockL]
+    countsA = np.concatenate(blockL)
+    if countsA.max() < 2**16:
+        countsA = countsA.astype(np.uint16)
+    if positions is True:
+        return (cfStr.indivL, chromA, posA, countsA)
+    return (cfStr.indivL, countsA)
+
+
 def fasta_to_cf(fastaFN, countsFN, splitChar='-', chromName="NA",
                 double_fixed_sites=False):
     """Convert fasta to counts format.
@@ -344,6 +432,101 @@ def fasta_to_cf(fastaFN, countsFN, splitChar='-', chromName="NA",
     cfw.close()
 
 
+# Columns of the A, C, G and T counts in PoPoolation2 sync files
+# (A:T:C:G:N:del).
+syncInd = [0, 2, 3, 1]
+
+
+def sync_to_cf(syncFN, countsFN, nameL=None, blockSize=100000,
+               bgzip=False):
+    """Convert a PoPoolation2 sync file to counts format.
+
+    Each line of a sync file contains the chromosome, the position, the
+    reference base and the counts of each population in the form
+    A:T:C:G:N:del.  The counts are reordered to A,C,G,T; N and
+    deletion counts are dropped.  Missing counts ('.') are set to 0.
+
+    The sync file is read in blocks of *blockSize* lines and the
+    counts of each block are parsed at once.  The number of sites is
+    counted before the conversion so that the complete header can be
+    written directly.
+
+    The input as well as the output files can additionally be gzipped
+    (indicated by a .gz file ending).
+
+    :param str syncFN: Name of the sync file.
+    :param str countsFN: Name of the counts file.
+    :param [str] nameL: Optional; names of the populations.  Defaults
+      to pop1, pop2, ...
+    :param int blockSize: Optional; number of lines that are
+      converted at once.
+    :param Boolean bgzip: Optional; compress the counts file with
+      BGZF (block gzip).
+
+    :rtype: int, number of sites
+
+    """
+    nSites = 0
+    nPop = None
+    with sb.gz_open(syncFN) as f:
+        for ln in f:
+            if ln.strip() == "":
+                continue
+            if nPop is None:
+                nPop = len(ln.split()) - 3
+            nSites += 1
+    if nPop is None:
+        raise NotACountsFormatFileError("Sync file is empty.")
+    if nameL is None:
+        nameL = ["pop" + str(i+1) for i in range(nPop)]
+    elif len(nameL) != nPop:
+        raise CountsFormatWriterError("`nameL` is not valid.")
+    logging.debug("Number of Populations: %s", nPop)
+    logging.debug("Number of Sites: %s", nSites)
+
+    if bgzip is True:
+        outFO = ps.BGZFile(countsFN, mode='wb')
+
+        def write(string):
+            outFO.write(string.encode())
+    else:
+        outFO = sb.gz_open(countsFN, mode='w')
+        write = outFO.write
+    write("COUNTSFILE NPOP " + str(nPop) + " NSITES " + str(nSites) + '\n')
+    write("CHROM POS " + ' '.join(nameL) + '\n')
+    lnFmt = "%s %s " + ' '.join(["%d,%d,%d,%d"] * nPop)
+
+    def write_block(lnL):
+        fieldsL = [ln.split() for ln in lnL]
+        if any(len(fL) != nPop + 3 for fL in fieldsL):
+            raise NotACountsFormatFileError(
+                "Sync file has an inconsistent number of populations.")
+        cStr = ':'.join(':'.join(fL[3:]) for fL in fieldsL)
+        cA = np.array(cStr.replace('.', '0').split(':'), dtype=np.int64)
+        try:
+            cA = cA.reshape(len(lnL), nPop, 6)[:, :, syncInd]
+        except ValueError:
+            raise NotACountsFormatFileError(
+                "Population counts are not of the form A:T:C:G:N:del.")
+        cA = cA.reshape(len(lnL), 4 * nPop).tolist()
+        write('\n'.join(lnFmt % (fL[0], fL[1], *c)
+                         for (fL, c) in zip(fieldsL, cA)) + '\n')
+
+    with sb.gz_open(syncFN) as f:
+        lnL = []
+        for ln in f:
+            if ln.strip() == "":
+                continue
+            lnL.append(ln)
+            if len(lnL) == blockSize:
+                write_block(lnL)
+                lnL = []
+        if len(lnL) > 0:
+            write_block(lnL)
+    outFO.close()
+    return nSites
+
+
 def weighted_choice(lst):
     """Choose element in integer list according to its value.
 
@@ -499,7 +682,10 @@ class CFWriter():
       respective counts are summed up.  If *self.nL[i]* is given, the
       name of the summed sequence will be *self.nL[i]*.  If not, the
       name of the first individual in *vcfL[i]* will be used.
-    :param [str] nameL: Optional; a list of names. Cf. *self.mL*.
+    :param [str] nameL: Optional; a list of names. Cf. *self.mL*.  If
+      no vcf files are given, *nameL* gives the names of the
+      populations (e.g., if the counts are written with
+      :func:`write_Lns`).
     :param Boolean oneIndividual: Optional; pick one individual out
       of each population.
 
@@ -540,6 +726,10 @@ class CFWriter():
         *self.vcfL[i]*.
     :ivar assM: Assignment matrix that connects the individuals from
         the vcf files to the correct *self.cD* index.  Cf. *self.cD*
+    :ivar usedIndM: *self.usedIndM[i]* is the list of indices of the
+        individuals of *self.vcfL[i]* that are used (i.e., the
+        individuals *j* with *self.assM[i][j]* >= 0).  Only the data
+        of these individuals is decoded.
     :ivar int nPop: Number of different populations in count format
         output file (e.g. number of populations).  Filled by
         *self.__init_assM()* during initialization.
@@ -550,8 +740,22 @@ class CFWriter():
     :ivar char splitCh: Character that is used to split the
         individual names.
     :ivar Boolean onlySynonymous: Only write 4-fold degenerate sites.
+    :ivar Boolean onlyVariable: Only write positions where at least
+        one VCF file has a record.  Cf. :func:`set_only_variable`.
+    :ivar str invFN: Name of the file with the counts of the
+        monomorphic sites that are not written if *self.onlyVariable*
+        is set.
+    :ivar invD: Dictionary with the counts of the monomorphic sites
+        that are not written.  *self.invD[chrom]* is a list with the
+        counts of sites with reference base A, C, G and T.
     :ivar int baseCounter: Counts the total number of bases.
+    :ivar int minGQ: Minimum genotype quality (FORMAT field GQ) of a
+        call.  Cf. :func:`set_genotype_filter`.
+    :ivar int minDP: Minimum read depth (FORMAT field DP) of a call.
+    :ivar int maxDP: Maximum read depth (FORMAT field DP) of a call.
     :ivar Boolean __force: If set to true, skip name checks.
+    :ivar __fmtIndL: *self.__fmtIndL[i]* is a dictionary that maps the
+        FORMAT strings of *self.vcfL[i]* to the positions of GQ and DP.
 
     """
     def __init__(self, vcfFileNameL, outFileName,
@@ -574,6 +778,7 @@ class CFWriter():
         self.indM = []
         self.nIndL = []
         self.assM = []
+        self.usedIndM = []
         self.nPop = 0
         # Variables that have to be set manually.
         self.refSeq = None
@@ -581,9 +786,21 @@ class CFWriter():
         self.ploidy = 2
         self.splitCh = splitChar
         self.onlySynonymous = False
+        self.onlyVariable = False
+        self.invFN = None
+        self.invD = {}
         self.oneIndiv = oneIndividual
         self.baseCounter = 0
+        self.minGQ = None
+        self.minDP = None
+        self.maxDP = None
+        self.useAD = False
+        self.adDepth = None
+        self.rng = np.random.default_rng()
         self.__force = False
+        self.__fmtIndL = [{} for i in range(self.nV)]
+        # Pool of :class:`NucBase` objects that can be refilled.
+        self.__basePool = []
 
         self.__init_vcfTfL()
         self.__init_outFO()
@@ -636,6 +853,11 @@ class CFWriter():
     # TODO: Check if this works, when individuals are mixed.
     def __init_assM(self):
         """Fill assignment matrix *self.assM*."""
+        if (self.nV == 0) and (self.nL is not None):
+            # No vcf files; the populations are given by *self.nL*.
+            self.nPop = len(self.nL)
+            return
+
         def collapse_and_append(n, dN):
             """Collapse individual names of *self.vcfL[n]*.
 
@@ -710,6 +932,9 @@ class CFWriter():
                     n += 1
             print(indivStr, file=self.outFO)
 
+        self.usedIndM = [[j for j in range(len(aL)) if aL[j] >= 0]
+                         for aL in self.assM]
+
     def __init_nL(self):
         """Fill *self.nL*."""
         def append_to_nL(i):
@@ -732,6 +957,139 @@ class CFWriter():
         """Initialize the list with counts data."""
         self.cD = [[0, 0, 0, 0] for i in range(self.nPop)]
 
+    def __get_nuc_base(self, ln):
+        """Read the VCF line *ln* into a :class:`NucBase`.
+
+        Take a :class:`NucBase <cflib.vcf.NucBase>` from
+        *self.__basePool* and refill it.  Only allocate a new one if
+        the pool is empty.  Bases are given back to the pool with
+        :func:`__release_nuc_bases`.
+
+        """
+        try:
+            base = self.__basePool.pop()
+        except IndexError:
+            base = vcf.NucBase()
+        vcf.update_base(ln, base, info=False)
+        base.ploidy = self.ploidy
+        return base
+
+    def __check_call(self, smp, gqI, dpI):
+        """Check if the call in sample field *smp* passes the filters.
+
+        Missing values (or missing FORMAT fields) of GQ and DP fail
+        the respective filter.
+
+        """
+        smpL = smp.split(':')
+        try:
+            if self.minGQ is not None and \
+               float(smpL[gqI]) < self.minGQ:
+                return False
+            if self.minDP is not None or self.maxDP is not None:
+                dp = int(smpL[dpI])
+                if self.minDP is not None and dp < self.minDP:
+                    return False
+                if self.maxDP is not None and dp > self.maxDP:
+                    return False
+        except (TypeError, IndexError, ValueError):
+            return False
+        return True
+
+    def __get_gt_data(self, vI, base):
+        """Get genotypes of the used individuals of *base*.
+
+        The data is decoded for the individuals *self.usedIndM[vI]*
+        only.  If a genotype filter is set (cf.
+        :func:`set_genotype_filter`), calls that fail are set to
+        missing (None).
+
+        :param int vI: Index of the VCF file the base stems from.
+        :param NucBase base: The base.
+
+        :rtype: matrix of integers; cf. :func:`get_speciesData
+            <cflib.vcf.NucBase.get_speciesData>`
+
+        """
+        usedL = self.usedIndM[vI]
+        if self.minGQ is None and self.minDP is None and self.maxDP is None:
+            return base.get_speciesData(usedL)
+        (gqI, dpI, adI) = self.__get_fmt_ind(vI, base.format)
+        data = []
+        for smp in base.get_samples(usedL):
+            if self.__check_call(smp, gqI, dpI):
+                data.append(vcf.decode_gt(smp, self.ploidy))
+            else:
+                data.append([None] * self.ploidy)
+        return data
+
+    def __get_ad_data(self, vI, base):
+        """Get allele depths of the used individuals of *base*.
+
+        The AD field of the individuals *self.usedIndM[vI]* is
+        decoded.  *data[k][a]* is the depth of allele *a* (0 is the
+        reference) of individual *self.usedIndM[vI][k]*.  Depths that
+        can not be read are set to None.  If a genotype filter is set
+        (cf. :func:`set_genotype_filter`), the depths of calls that
+        fail are all set to None.
+
+        :param int vI: Index of the VCF file the base stems from.
+        :param NucBase base: The base.
+
+        :rtype: matrix of integers
+
+        """
+        (gqI, dpI, adI) = self.__get_fmt_ind(vI, base.format)
+        check = (self.minGQ is not None or self.minDP is not None or
+                 self.maxDP is not None)
+        data = []
+        for smp in base.get_samples(self.usedIndM[vI]):
+            if adI is None or (check and not
+                               self.__check_call(smp, gqI, dpI)):
+                data.append([])
+                continue
+            try:
+                adL = smp.split(':')[adI].split(',')
+            except IndexError:
+                data.append([])
+                continue
+            for j in range(len(adL)):
+                try:
+                    adL[j] = int(adL[j])
+                except ValueError:
+                    adL[j] = None
+            data.append(adL)
+        return data
+
+    def __get_fmt_ind(self, vI, fmt):
+        """Get the positions of GQ, DP and AD in the FORMAT field *fmt*.
+
+        The positions are cached in *self.__fmtIndL[vI]*.
+
+        """
+        try:
+            return self.__fmtIndL[vI][fmt]
+        except KeyError:
+            indT = vcf.get_format_indices(fmt, ['GQ', 'DP', 'AD'])
+            self.__fmtIndL[vI][fmt] = indT
+            return indT
+
+    def __downsample_cD(self):
+        """Downsample the counts in *self.cD* to *self.adDepth*.
+
+        The bases of populations with a depth above *self.adDepth* are
+        sampled without replacement.
+
+        """
+        for p in range(self.nPop):
+            if sum(self.cD[p]) > self.adDepth:
+                self.cD[p] = self.rng.multivariate_hypergeometric(
+                    self.cD[p], self.adDepth).tolist()
+
+    def __release_nuc_bases(self, baseL):
+        """Give the bases in *baseL* back to *self.__basePool*."""
+        self.__basePool.extend(baseL)
+
     def __snp(self, rg):
         """Generate SNPs in region *rg* out of *self.vcfL*.
 
@@ -743,6 +1101,9 @@ class CFWriter():
         >>> for s in self.snp(rg):
         ....:   s.print_info()
 
+        The returned :class:`NucBase` objects are reused after they
+        have been released with :func:`__release_nuc_bases`.
+
         """
         snpL = []
         snpIterL = []
@@ -751,8 +1112,7 @@ class CFWriter():
                                                  start=rg.start, end=rg.end))
         for i in range(self.nV):
             try:
-                snpL.append(vcf.get_nuc_base_from_line(next(snpIterL[i]),
-                                                       ploidy=self.ploidy))
+                snpL.append(self.__get_nuc_base(next(snpIterL[i])))
             except StopIteration:
                 snpL.append(None)
         while True:
@@ -770,8 +1130,7 @@ class CFWriter():
                     minI = j
             yield (minI, snpL[minI])
             try:
-                snpL[minI] = vcf.get_nuc_base_from_line(next(snpIterL[minI]),
-                                                        ploidy=self.ploidy)
+                snpL[minI] = self.__get_nuc_base(next(snpIterL[minI]))
             except StopIteration:
                 snpL[minI] = None
 
@@ -802,7 +1161,9 @@ class CFWriter():
         is raised if the chromosome names do not match.
 
         """
-        if snpL is not None:
+        # Only decode all fields of the SNPs if they are printed.
+        if (snpL is not None) and \
+           logging.getLogger().isEnabledFor(logging.DEBUG):
             logging.debug("Next SNP(s):")
             for s in snpL:
                 logging.debug(s.get_info())
@@ -844,16 +1205,18 @@ class CFWriter():
         except KeyError:
             raise sb.NotAValidRefBase()
         # If there are no SNPS, fill *self.cD* with data from reference.
+        # Allele depths are only known from the VCF records.
         if iL is None:
-            for i in range(self.nV):
-                for pop in self.assM[i]:
-                    update_cD(pop, r)
+            if self.useAD is False:
+                for i in range(self.nV):
+                    for j in self.usedIndM[i]:
+                        update_cD(self.assM[i][j], r)
         elif (snpL is not None) and (len(iL) == len(snpL)):
             # Else, only fill *self.cD* where the individual has no SNP.
             for i in range(self.nV):
-                if i not in iL:
-                    for pop in self.assM[i]:
-                        update_cD(pop, r)
+                if i not in iL and self.useAD is False:
+                    for j in self.usedIndM[i]:
+                        update_cD(self.assM[i][j], r)
             # Now traverse the SNPs.
             for sI in range(len(iL)):
                 # Check if the reference bases match.
@@ -881,24 +1244,39 @@ class CFWriter():
                         indel = True
                         logging.warn("Indel at chrom %s pos %d.", self.chrom,
                                      self.pos + self.offset)
-                spData = snpL[sI].get_speciesData()
                 vI = iL[sI]
+                if self.useAD is True:
+                    adData = self.__get_ad_data(vI, snpL[sI])
+                    for (k, i) in enumerate(self.usedIndM[vI]):
+                        for (a, d) in enumerate(adData[k]):
+                            if d is None or d == 0:
+                                pass
+                            elif indel or a == 0:
+                                update_cD(self.assM[vI][i], r, delta=d)
+                            else:
+                                bI = dna[altBases[a-1]]
+                                update_cD(self.assM[vI][i], bI, delta=d)
+                    continue
+                # Only decode the data of the used individuals.
+                spData = self.__get_gt_data(vI, snpL[sI])
                 # Loop over individuals.
-                for i in range(0, len(spData)):
+                for (k, i) in enumerate(self.usedIndM[vI]):
                     # Loop over chromatides (e.g. diploid).
-                    for d in range(0, self.ploidy):
-                        if spData[i][d] is None:
+                    for a in spData[k][:self.ploidy]:
+                        if a is None:
                             pass
-                        elif indel or spData[i][d] == 0:
+                        elif indel or a == 0:
                             bI = r
                             update_cD(self.assM[vI][i], bI, delta=1)
                         else:
-                            bI = dna[altBases[spData[i][d]-1]]
+                            bI = dna[altBases[a-1]]
                             logging.debug("Use SNP of %s, population %s",
                                           self.indM[vI][i], self.assM[vI][i])
                             update_cD(self.assM[vI][i], bI, delta=1)
         else:
             raise sb.SequenceDataError("SNP information is not correct.")
+        if self.useAD is True and self.adDepth is not None:
+            self.__downsample_cD()
 
     def __get_Ln(self):
         """Return string with a line in counts format. Positional information
@@ -941,6 +1319,85 @@ class CFWriter():
         """
         self.ploidy = ploidy
 
+    def set_genotype_filter(self, minGQ=None, minDP=None, maxDP=None):
+        """Set thresholds for the calls of individuals.
+
+        The thresholds are evaluated with the FORMAT fields GQ and DP
+        of each sample while the VCF files are read.  Calls that fail
+        a threshold, or that lack the respective field, are treated as
+        missing.  A threshold of None disables the respective filter.
+
+        :param int minGQ: Minimum genotype quality.
+        :param int minDP: Minimum read depth.
+        :param int maxDP: Maximum read depth.
+
+        """
+        self.minGQ = minGQ
+        self.minDP = minDP
+        self.maxDP = maxDP
+
+    def set_allele_depth_mode(self, val=True, depth=None, seed=None):
+        """Count allele depths instead of genotypes.
+
+        This mode is meant for pool-sequencing data where each sample
+        of a VCF file is a pool of individuals and the genotype (GT)
+        is meaningless.  The read depths of the alleles (FORMAT field
+        AD) are added to the counts of the respective population.
+        Positions without a record are treated as missing data
+        because no read depths are known there (see also
+        :func:`set_only_variable`).
+
+        :param Boolean val: Turn the mode on or off.
+        :param int depth: Optional; downsample populations with a
+          higher depth to *depth* (sampling without replacement).
+        :param int seed: Optional; seed of the random number
+          generator used for downsampling.
+
+        """
+        self.useAD = val
+        self.adDepth = depth
+        if seed is not None:
+            self.rng = np.random.default_rng(seed)
+
+    def set_only_variable(self, val=True, invFileName=None):
+        """Only write positions where at least one VCF file has a record.
+
+        Monomorphic positions (positions without any record) are not
+        written to the counts file but only counted by their reference
+        base.  The counts for each chromosome are written to the file
+        *invFileName* upon :func:`close`; e.g.::
+
+          # Monomorphic sites not written to out.cf.gz.
+          CHROM A C G T
+          chr1 4215 3010 2978 4123
+
+        They can be used to reconstruct the weights of the constant
+        sites (e.g. for an ascertainment bias correction).
+
+        :param Boolean val: Turn the mode on or off.
+        :param str invFileName: Optional; name of the file with the
+          counts of the monomorphic sites.  Defaults to the name of
+          the counts file with ending '.inv' (before '.gz').
+
+        """
+        self.onlyVariable = val
+        if invFileName is None:
+            fn = self.outFN
+            if fn.endswith(".gz"):
+                invFileName = fn[:-3] + ".inv.gz"
+            else:
+                invFileName = fn + ".inv"
+        self.invFN = invFileName
+
+    def write_invariant(self):
+        """Write the counts of monomorphic sites to *self.invFN*."""
+        with sb.gz_open(self.invFN, mode='w') as fo:
+            print("# Monomorphic sites not written to",
+                  os.path.basename(self.outFN) + ".", file=fo)
+            print("CHROM A C G T", file=fo)
+            for (chrom, cL) in self.invD.items():
+                print(chrom, *cL, file=fo)
+
     def set_offset(self, offset):
         """Set the offset of the sequence.
 
@@ -959,55 +1416,125 @@ class CFWriter():
         self.baseCounter += 1
         print(self.__get_Ln(), file=self.outFO)
 
+    def write_Lns(self, chrom, posA, cA):
+        """Write many lines in counts format to *self.outFN*.
+
+        The counts are written directly and do not need to be filled
+        into *self.cD*.
+
+        :param str chrom: Name of the chromosome.
+        :param posA: 1-based positions (length n).
+        :param cA: Base counts (array of shape (n, *self.nPop*, 4)).
+
+        """
+        if len(posA) == 0:
+            return
+        lnFmt = "%s %d " + ' '.join(["%d,%d,%d,%d"] * self.nPop)
+        cL = np.asarray(cA).reshape(len(posA), 4 * self.nPop).tolist()
+        self.baseCounter += len(posA)
+        print('\n'.join(lnFmt % (chrom, p, *c)
+                         for (p, c) in zip(np.asarray(posA).tolist(), cL)),
+              file=self.outFO)
+
     def write_HLn(self):
         """Write the counts format header line to *self.outFN*."""
         print(self.__get_HLn(), file=self.outFO)
 
+    def __snp_groups(self, rg):
+        """Group the SNPs in region *rg* by position.
+
+        Generator that returns the tuple (rPos, iL, snpL) for each
+        position *rPos* in *rg* where at least one VCF file has a
+        record; cf. :func:`__fill_cD` for *iL* and *snpL*.
+
+        """
+        iL = []
+        snpL = []
+        rPos = None
+        for (nI, nSNP) in self.__snp(rg):
+            nPos = nSNP.pos - 1
+            if nPos < rg.start or nPos > rg.end:
+                self.__release_nuc_bases([nSNP])
+                continue
+            if nPos != rPos and len(snpL) > 0:
+                yield (rPos, iL, snpL)
+                iL = []
+                snpL = []
+            rPos = nPos
+            iL.append(nI)
+            snpL.append(nSNP)
+        if len(snpL) > 0:
+            yield (rPos, iL, snpL)
+
+    def __write_pos(self, rPos, iL=None, snpL=None):
+        """Fill *self.cD* at position *rPos* and write the line."""
+        self.pos = rPos - self.offset
+        try:
+            self.__fill_cD(iL, snpL)
+        except NoSynBase:
+            # Do nothing if base is not 4-fold degenerate.
+            logging.debug("Ignoring synonymous base.")
+        except sb.NotAValidRefBase:
+            # Do nothing if reference base is not valid.
+            logging.debug("Ignoring invalid reference base.")
+        else:
+            self.write_Ln()
+        if snpL is not None:
+            self.__release_nuc_bases(snpL)
+
+    def __count_invariant(self, start, end):
+        """Count the reference bases from *start* to *end* (excluded).
+
+        The counts are added to *self.invD*.  Positions with a base
+        that is not one of A, C, G or T (or U) are ignored as well as
+        non-synonymous positions if *self.onlySynonymous* is set.
+
+        """
+        if end <= start:
+            return
+        cL = self.invD.setdefault(self.chrom, [0, 0, 0, 0])
+        if self.onlySynonymous is True:
+            for p in range(start - self.offset, end - self.offset):
+                if self.refSeq.is_synonymous(p) is False:
+                    continue
+                try:
+                    cL[ind4[self.refSeq.data[p].lower()]] += 1
+                except KeyError:
+                    pass
+        else:
+            seg = str(self.refSeq.data[start - self.offset:
+                                       end - self.offset]).lower()
+            for (b, i) in ind4.items():
+                cL[i] += seg.count(b)
+
     def write_Rn(self, rg):
         """Write lines in counts format to *self.outFN*.
 
+        If *self.onlyVariable* is set, only positions where at least
+        one VCF file has a record are written; the other positions
+        are counted in *self.invD* (cf. :func:`set_only_variable`).
+
         :param Region rg: :class:`Region <cflib.seqbase.Region>`
                           object that determines the region that is
                           covered.
 
         """
         self.set_offset(rg.start)
-        snpsG = self.__snp(rg)
-        try:
-            (nI, nSNP) = next(snpsG)
-        except StopIteration:
-            nI = None
-            nSNP = None
-
-        for rPos in range(rg.start, rg.end + 1):
-            snpL = None
-            iL = None
-            while (nI is not None) or (nSNP is not None):
-                if nSNP.pos - 1 == rPos:
-                    if (snpL is None) and (iL is None):
-                        snpL = []
-                        iL = []
-                    snpL.append(nSNP)
-                    iL.append(nI)
-                    try:
-                        (nI, nSNP) = next(snpsG)
-                    except StopIteration:
-                        nI = None
-                        nSNP = None
-                else:
-                    break
-            self.chrom = rg.chrom
-            self.pos = rPos - self.offset
-            try:
-                self.__fill_cD(iL, snpL)
-            except NoSynBase:
-                # Do nothing if base is not 4-fold degenerate.
-                logging.debug("Ignoring synonymous base.")
-            except sb.NotAValidRefBase:
-                # Do nothing if reference base is not valid.
-                logging.debug("Ignoring invalid reference base.")
+        self.chrom = rg.chrom
+        nPos = rg.start
+        for (rPos, iL, snpL) in self.__snp_groups(rg):
+            if self.onlyVariable is True:
+                self.__count_invariant(nPos, rPos)
             else:
-                self.write_Ln()
+                for p in range(nPos, rPos):
+                    self.__write_pos(p)
+            self.__write_pos(rPos, iL, snpL)
+            nPos = rPos + 1
+        if self.onlyVariable is True:
+            self.__count_invariant(nPos, rg.end + 1)
+        else:
+            for p in range(nPos, rg.end + 1):
+                self.__write_pos(p)
 
     def add_base_to_sequence(self, pop_id, base_char,
                              double_fixed_sites=False):
@@ -1098,6 +1625,8 @@ class CFWriter():
         for tf in self.vcfTfL:
             tf.close()
         self.outFO.close()
+        if self.onlyVariable is True:
+            self.write_invariant()
 
         # Insert the first line.  TODO: The whole file needs to be
         # copied, maybe there is a better method?
@@ -11,6 +11,8 @@ Classes:
   - :class:`FaStream`, fasta file sequence stream object
   - :class:`MFaStream`, multiple alignment fasta file sequence stream object
   - :class:`FaSeq`, fasta file sequence object
+  - :class:`FaRef`, indexed fasta reference with lazily read
+    sequences
   - :class:`MFaStrFilterProps`, define multiple fasta file filter preferences
 
 Exception Classes:
@@ -33,9 +35,14 @@ __docformat__ = 'restructuredtext'
 
 import cflib.seqbase as sb
 import cflib.vcf as vcf
+import collections
+import logging
 import sys
 import re
 
+import numpy as np
+import pysam as ps
+
 
 class NotAFastaFileError(sb.SequenceDataError):
     """Exception raised if given fasta file is not valid."""
@@ -318,12 +325,13 @@ class MFaStream():
             self.nSpecies = len(self.seqL)
             return self.seqL[0].name
 
-    def orient(self, firstOnly=False):
+    def orient(self, firstOnly=False, lazy=False):
         """Orient all sequences of the alignment to be in forward direction.
 
-        This is rather slow for long sequences.
-
         :param Boolean firstOnly: If true, orient the first sequence only.
+        :param Boolean lazy: If true, sequences are reversed and
+          complemented lazily (cf. :func:`Seq.rev_comp()
+          <cflib.seqbase.Seq.rev_comp>`).
 
         """
         if firstOnly is False:
@@ -335,7 +343,7 @@ class MFaStream():
 
         for i in range(length):
             if self.seqL[i].get_rc() is True:
-                self.seqL[i].rev_comp()
+                self.seqL[i].rev_comp(lazy=lazy)
 
     def print_msa(self, fo=sys.stdout):
         """Print multiple sequence alignment at point.
@@ -406,6 +414,37 @@ class MFaStrFilterProps():
         self.minExonLen = 21
         self.check_exon_numbers = True
 
+        self.__patterns = None
+        self.__patternsMaxGapLength = None
+
+    def get_patterns(self):
+        """Return the compiled regular expressions used by the filters.
+
+        The regular expressions are compiled only once.  They are
+        recompiled if `maxGapLength` has been changed in the meantime.
+
+        :rtype: dict with compiled regular expressions
+
+        """
+        if (self.__patterns is not None) and \
+           (self.__patternsMaxGapLength == self.maxGapLength):
+            return self.__patterns
+        # Define start and stop codon regex strings
+        startCodon = r"(atg)"
+        stopCodons = r"(tag|taa|tga)"
+        # Define regex pattern for indel
+        indel = r'-'
+        self.__patterns = {
+            'start': re.compile(r'^' + startCodon, re.I),
+            'stop': re.compile(stopCodons + r'$', re.I),
+            'frameShift': re.compile(indel + r'+'),
+            'longGap': re.compile(indel + r'{' +
+                                  repr(self.maxGapLength + 1) + r',}'),
+            'nonsense': re.compile(r'(' + stopCodons + r')' + r'(?!$)',
+                                   re.I)}
+        self.__patternsMaxGapLength = self.maxGapLength
+        return self.__patterns
+
 
 def filter_mfa_str(mfaStr, fp, verb=None):
     """Check multiple sequence alignment of an MFaStream.
@@ -414,7 +453,18 @@ def filter_mfa_str(mfaStr, fp, verb=None):
     not apt for analysis.  These low quality alignments need to be
     filtered out of the original multiple sequence alignment fasta
     file.  If `verb` is unset from None, information about any
-    possible rejection is printed to the standard output.
+    possible rejection is printed to the standard output; `verb` does
+    not change which alignments are rejected.
+
+    The filters are applied in order of increasing computational cost
+    so that bad alignments are rejected early: all aligned, exon
+    length, exon numbers, start codons, stop codons, long gaps,
+    frame-shifting gaps, nonsense codons and divergence.  If an
+    alignment fails several filters, the first failed filter in this
+    order gives the rejection reason.  The regular expressions are
+    compiled once per :class:`MFaStrFilterProps`, the exon information
+    is parsed once per alignment and the divergence is calculated for
+    all sequences at once.
 
     :ivar MFaStream mfaStr: :class:`MFaStream` object to check.
     :ivar MFaStrFilterProps fp: :class:`MFaStrFilterProps`; Properties
@@ -424,43 +474,43 @@ def filter_mfa_str(mfaStr, fp, verb=None):
     :rtype: Boolean, True if all filters have been passed.
 
     """
-    # Define start and stop codon regex strings
-    startCodon = r"(atg)"
-    stopCodons = r"(tag|taa|tga)"
-    # Define regex pattern for indel
-    indel = r'-'
+    seqL = mfaStr.seqL
+    patterns = fp.get_patterns()
+    # Exon information of all sequences; only parsed once.
+    exonNrL = []
+
+    def get_exon_nrs():
+        if len(exonNrL) == 0:
+            exonNrL.extend([s.get_exon_nr() for s in seqL])
+        return exonNrL
 
     def check_all_aligned():
-        if len(mfaStr.seqL) == fp.nSpecies:
+        if len(seqL) == fp.nSpecies:
             return True
         else:
             if verb is not None:
-                print(mfaStr.seqL[0].name, "rejection;",
+                print(seqL[0].name, "rejection;",
                       "Not all species are aligned.")
             return False
 
     def check_divergence():
-        s0Data = mfaStr.seqL[0].data
-        for s in mfaStr.seqL[1:]:
-            sData = s.data
-            counts = 0
-            for i in range(len(s0Data)):
-                if s0Data[i].lower() != sData[i].lower():
-                    counts += 1
-            if (counts / len(s0Data)) > fp.maxDiv:
-                if verb is not None:
-                    print(mfaStr.seqL[0].name, "rejection;",
-                          "Sequences are too diverged.")
-                    return False
+        alignM = sb.encode_seqs(seqL)
+        length = alignM.shape[1]
+        if length == 0:
+            return True
+        divL = np.count_nonzero(alignM[1:] != alignM[0], axis=1) / length
+        if np.any(divL > fp.maxDiv):
+            if verb is not None:
+                print(seqL[0].name, "rejection;",
+                      "Sequences are too diverged.")
+            return False
         return True
 
     def check_start_codons():
-        pattern = r'^' + startCodon
-        for s in mfaStr.seqL:
-            (nEx, nExTot) = s.get_exon_nr()
+        pattern = patterns['start']
+        for (s, (nEx, nExTot)) in zip(seqL, get_exon_nrs()):
             if nEx == 1:
-                dataString = s.data
-                m = re.search(pattern, dataString, re.I)
+                m = pattern.search(str(s.data))
                 if m is None:
                     if verb is not None:
                         print(s.name, "rejection;",
@@ -469,12 +519,11 @@ def filter_mfa_str(mfaStr, fp, verb=None):
         return True
 
     def check_stop_codons():
-        pattern = stopCodons + r'$'
-        for s in mfaStr.seqL:
-            (nEx, nExTot) = s.get_exon_nr()
+        pattern = patterns['stop']
+        for (s, (nEx, nExTot)) in zip(seqL, get_exon_nrs()):
             if nEx == nExTot:
-                dataString = s.data
-                m = re.search(pattern, dataString, re.I)
+                # Only the end of the sequence needs to be searched.
+                m = pattern.search(str(s.data), max(0, len(s.data) - 3))
                 if m is None:
                     if verb is not None:
                         print(s.name, "rejection;",
@@ -483,10 +532,12 @@ def filter_mfa_str(mfaStr, fp, verb=None):
         return True
 
     def check_frame_shifting_gaps():
-        pattern = indel + r'+'
-        for s in mfaStr.seqL:
-            dataString = s.data
-            i = re.finditer(pattern, dataString, re.I)
+        pattern = patterns['frameShift']
+        for s in seqL:
+            dataString = str(s.data)
+            if '-' not in dataString:
+                continue
+            i = pattern.finditer(dataString)
             for m in i:
                 # A gap has been found.  Check for frame shift.
                 if ((m.end() - m.start()) % 3) != 0:
@@ -497,10 +548,12 @@ def filter_mfa_str(mfaStr, fp, verb=None):
         return True
 
     def check_for_long_gaps():
-        pattern = indel + r'{' + repr(fp.maxGapLength + 1) + r',}'
-        for s in mfaStr.seqL:
-            dataString = s.data
-            m = re.search(pattern, dataString, re.I)
+        pattern = patterns['longGap']
+        for s in seqL:
+            dataString = str(s.data)
+            if '-' not in dataString:
+                continue
+            m = pattern.search(dataString)
             if m is not None:
                 if verb is not None:
                     print(s.name, "rejection;",
@@ -509,10 +562,10 @@ def filter_mfa_str(mfaStr, fp, verb=None):
         return True
 
     def check_nonsense_codon():
-        pattern = r'(' + stopCodons + r')' + r'(?!$)'
-        for s in mfaStr.seqL:
-            dataString = s.data
-            m = re.search(pattern, dataString, re.I)
+        pattern = patterns['nonsense']
+        for s in seqL:
+            dataString = str(s.data)
+            m = pattern.search(dataString)
             if m is not None:
                 # Stop codon pattern has been found.  Check if frame
                 # is not shifted.
@@ -525,35 +578,32 @@ def filter_mfa_str(mfaStr, fp, verb=None):
         return True
 
     def check_exon_length():
-        dataStr = mfaStr.seqL[0].data
+        dataStr = str(seqL[0].data)
         if len(dataStr) < fp.minExonLen:
             if verb is not None:
-                print(mfaStr.seqL[0].name, "rejection;",
+                print(seqL[0].name, "rejection;",
                       "Exon is too short.")
             return False
         return True
 
     def check_exon_numbers():
-        nExTotL = []
-        for s in mfaStr.seqL:
-            (nEx, nExTot) = s.get_exon_nr()
-            nExTotL.append(nExTot)
-        for i in range(len(nExTotL)):
-            if nExTotL[0] != nExTotL[i]:
-                if verb is not None:
-                    print(mfaStr.seqL[0].name, "rejection;",
-                          "Exon numbers do not match.")
-                return False
+        nExTotL = [nExTot for (nEx, nExTot) in get_exon_nrs()]
+        if nExTotL.count(nExTotL[0]) != len(nExTotL):
+            if verb is not None:
+                print(seqL[0].name, "rejection;",
+                      "Exon numbers do not match.")
+            return False
         return True
 
+    # Cheapest checks first.
     if fp.check_all_aligned:
         if not check_all_aligned():
             return False
-    if fp.check_for_long_gaps:
-        if not check_for_long_gaps():
+    if fp.check_exon_length:
+        if not check_exon_length():
             return False
-    if (fp.nSpecies > 1) and fp.check_divergence:
-        if not check_divergence():
+    if fp.check_exon_numbers:
+        if not check_exon_numbers():
             return False
     if fp.check_start_codons:
         if not check_start_codons():
@@ -561,17 +611,17 @@ def filter_mfa_str(mfaStr, fp, verb=None):
     if fp.check_stop_codons:
         if not check_stop_codons():
             return False
+    if fp.check_for_long_gaps:
+        if not check_for_long_gaps():
+            return False
     if fp.check_frame_shifting_gaps:
         if not check_frame_shifting_gaps():
             return False
     if fp.check_nonsense_codon:
         if not check_nonsense_codon():
             return False
-    if fp.check_exon_length:
-        if not check_exon_length():
-            return False
-    if fp.check_exon_numbers:
-        if not check_exon_numbers():
+    if (fp.nSpecies > 1) and fp.check_divergence:
+        if not check_divergence():
             return False
     return True
 
@@ -579,19 +629,36 @@ def filter_mfa_str(mfaStr, fp, verb=None):
 class FaSeq():
     """Store sequence data retrieved from a fasta file.
 
+    The sequences can be accessed by name in constant time and the
+    alignment of the sequences is encoded as a NumPy matrix
+    (cf. :func:`get_align_matrix`) which is used to calculate
+    alignment statistics such as pairwise distances.
+
     :ivar str name: Name of the `FaSeq` object.
     :ivar [Seq] seqL: List of :class:`Seq <cflib.seqbase.Seq>`
                       objects that store the actual sequence data.
+    :ivar dict seqD: Dictionary with sequence names as keys and
+                     :class:`Seq <cflib.seqbase.Seq>` objects as
+                     values.
+    :ivar dict seqIndD: Dictionary with sequence names as keys and
+                        indices into *seqL* as values.
     :ivar int nSepcies: Number of saved species / individuals /
                         chromosomes.
 
     """
+    # Gaps and unknown bases (cf. :func:`get_p_distance_matrix`).
+    missingBases = 'n*-.'
+
     def __init__(self):
         self.name = ""
         self.seqL = []
         self.seqD = {}
+        self.seqIndD = {}
         self.nSpecies = 0
 
+        self.__alignM = None
+        self.__alignDataL = []
+
     def print_info(self, maxB=50):
         """Print fasta sequence information.
 
@@ -620,29 +687,260 @@ class FaSeq():
         seq = self.seqL[i]
         return seq
 
+    def get_seq_index(self, seq):
+        """Return the index of the sequence with name `seq`.
+
+        :raises: :class:`SequenceDataError
+          <cflib.seqbase.SequenceDataError>`, if the sequence name is
+          not found.
+
+        """
+        i = self.seqIndD.get(seq)
+        if (i is None) or (i >= len(self.seqL)) or \
+           (self.seqL[i].name != seq):
+            # The index is outdated, e.g., because sequences have
+            # been added manually.
+            self.seqIndD = {}
+            for (j, s) in enumerate(self.seqL):
+                self.seqIndD.setdefault(s.name, j)
+            try:
+                i = self.seqIndD[seq]
+            except KeyError:
+                raise sb.SequenceDataError("Sequence name not found.")
+        return i
+
     def get_seq_base(self, seq, pos):
         """Return base at 1-based position `pos` in sequence with name
         `seq`."""
-        names = self.get_seq_names()
-        try:
-            i = names.index(seq)
-        except:
-            raise sb.SequenceDataError("Sequence name not found.")
+        i = self.get_seq_index(seq)
         if pos > self.seqL[i].dataLen:
             raise sb.SequenceDataError("Position out of range.")
         return self.seqL[i].get_base(pos)
 
+    def fetch(self, seq, start, end):
+        """Return the bases from 0-based position `start` to `end`
+        (not included) of the sequence with name `seq`.
+
+        Cf. :func:`FaRef.fetch`.
+
+        """
+        return self.seqL[self.get_seq_index(seq)].data[start:end]
+
+    def get_align_matrix(self):
+        """Return the encoded alignment.
+
+        The alignment is a NumPy matrix of shape (nSpecies, L) with
+        the lowered bases encoded as ASCII codes
+        (cf. :func:`encode_seqs <cflib.seqbase.encode_seqs>`).  The
+        matrix is cached and only recalculated if the sequence data
+        has changed.
+
+        :raises: :class:`SequenceDataError
+          <cflib.seqbase.SequenceDataError>`, if the sequences do not
+          have equal length.
+
+        :rtype: numpy.ndarray
+
+        """
+        seqL = self.seqL[:self.nSpecies]
+        if (self.__alignM is None) or \
+           (len(self.__alignDataL) != len(seqL)) or \
+           any(d is not s.data for (d, s) in zip(self.__alignDataL, seqL)):
+            self.__alignM = sb.encode_seqs(seqL)
+            self.__alignDataL = [s.data for s in seqL]
+        return self.__alignM
+
+    def get_missing_mask(self):
+        """Return a Boolean matrix that is True for gaps and unknown bases.
+
+        Gaps and unknown bases are given in *FaSeq.missingBases*.
+
+        :rtype: numpy.ndarray
+
+        """
+        return np.isin(self.get_align_matrix(),
+                       sb.encode_seq(self.missingBases))
+
+    def get_variable_columns(self, ignoreMissing=False):
+        """Return a Boolean mask of the variable columns of the alignment.
+
+        A column is variable if not all bases are equal (the case of
+        the bases is ignored).  If *ignoreMissing* is True, gaps and
+        unknown bases (cf. :func:`get_missing_mask`) are ignored and
+        a column is only variable if at least two different bases are
+        present.
+
+        :param Boolean ignoreMissing: Optional; ignore gaps and
+          unknown bases.
+
+        :rtype: numpy.ndarray
+
+        """
+        alignM = self.get_align_matrix()
+        if alignM.shape[0] == 0:
+            return np.zeros(0, dtype=bool)
+        if ignoreMissing is False:
+            return np.any(alignM != alignM[0], axis=0)
+        missM = self.get_missing_mask()
+        minA = np.where(missM, 255, alignM).min(axis=0)
+        maxA = np.where(missM, 0, alignM).max(axis=0)
+        return maxA > minA
+
+    def get_nr_segregating_sites(self, ignoreMissing=False):
+        """Return the number of segregating sites.
+
+        Cf. :func:`get_variable_columns`.
+
+        :param Boolean ignoreMissing: Optional; ignore gaps and
+          unknown bases.
+
+        :rtype: int
+
+        """
+        return int(np.count_nonzero(self.get_variable_columns(ignoreMissing)))
+
     def get_distance(self):
         """Number of segregating bases.
+
+        In contrast to :func:`get_nr_segregating_sites`, the case of
+        the bases is respected (e.g., 'A' and 'a' differ).
+
         """
-        count = 0
-        for i in range(self.seqL[0].dataLen):
-            base = self.seqL[0].get_base(i)
-            for s in range(self.nSpecies):
-                if base != self.seqL[s].get_base(i):
-                    count += 1
-                    break
-        return count
+        alignM = sb.encode_seqs(self.seqL[:self.nSpecies], lower=False)
+        if alignM.shape[0] == 0:
+            return 0
+        return int(np.count_nonzero(np.any(alignM != alignM[0], axis=0)))
+
+    def get_p_distance_matrix(self, ignoreMissing=False, chunkSize=100000):
+        """Return the matrix of pairwise p-distances.
+
+        The p-distance of two sequences is the proportion of sites at
+        which the bases differ (the case of the bases is ignored).  If
+        *ignoreMissing* is True, only sites where both sequences have
+        no gap and no unknown base (cf. :func:`get_missing_mask`) are
+        compared.  If two sequences have no comparable sites, their
+        distance is NaN.
+
+        The distances are computed with matrix products on indicator
+        matrices of the bases, *chunkSize* columns at a time.
+
+        :param Boolean ignoreMissing: Optional; ignore gaps and
+          unknown bases.
+        :param int chunkSize: Optional; number of columns that are
+          processed at once.
+
+        :rtype: numpy.ndarray of shape (nSpecies, nSpecies)
+
+        """
+        alignM = self.get_align_matrix()
+        n = alignM.shape[0]
+        if ignoreMissing is True:
+            missM = self.get_missing_mask()
+        matchM = np.zeros((n, n))
+        compM = np.zeros((n, n))
+        for i in range(0, alignM.shape[1], chunkSize):
+            chunk = alignM[:, i:i+chunkSize]
+            if ignoreMissing is True:
+                validM = ~missM[:, i:i+chunkSize]
+                validF = validM.astype(np.float64)
+                compM += validF @ validF.T
+            else:
+                validM = None
+                compM += chunk.shape[1]
+            for b in np.unique(chunk):
+                indM = chunk == b
+                if validM is not None:
+                    indM &= validM
+                indF = indM.astype(np.float64)
+                matchM += indF @ indF.T
+        with np.errstate(divide='ignore', invalid='ignore'):
+            distM = (compM - matchM) / compM
+        return distM
+
+
+class FaRef():
+    """Access the sequences of an indexed fasta reference.
+
+    The sequences (e.g., chromosomes) are only read when they are
+    accessed.  The fasta file is read with :class:`pysam.FastaFile`
+    which needs an index (a .fai file, and a .gzi file if the fasta
+    file is compressed with bgzip).  The index is created if it does
+    not exist.  Recently accessed sequences are kept in memory as long
+    as their total length does not exceed *maxMem*; bases of longer
+    sequences are read directly from the file.
+
+    If the fasta file cannot be indexed (e.g., because it is
+    compressed with gzip instead of bgzip), the whole file is read
+    with :func:`open_seq`.
+
+    :param str faFileName: Name of the fasta file.
+    :param int maxMem: Optional; maximum number of bases kept in
+      memory.
+
+    :ivar str faFileName: Name of the fasta file.
+    :ivar int maxMem: Maximum number of bases kept in memory.
+    :ivar ff: The :class:`pysam.FastaFile`, or the :class:`FaSeq` if
+      the file cannot be indexed.
+    :ivar OrderedDict seqD: Sequences kept in memory, least recently
+      used first.
+    :ivar int nBases: Number of bases kept in memory.
+
+    """
+
+    def __init__(self, faFileName, maxMem=2**29):
+        self.faFileName = faFileName
+        self.maxMem = maxMem
+        self.seqD = collections.OrderedDict()
+        self.nBases = 0
+        try:
+            self.ff = ps.FastaFile(faFileName)
+        except (OSError, ValueError) as e:
+            logging.warning("Fasta file %s cannot be indexed (%s); "
+                            "reading the whole file.", faFileName, e)
+            self.ff = open_seq(faFileName)
+
+    def get_seq(self, seq):
+        """Return the bases of the sequence with name `seq`.
+
+        The sequence is read from the file if it is not kept in
+        memory.
+
+        :rtype: str
+
+        """
+        if isinstance(self.ff, FaSeq):
+            return self.ff.seqL[self.ff.get_seq_index(seq)].data
+        data = self.seqD.get(seq)
+        if data is not None:
+            self.seqD.move_to_end(seq)
+            return data
+        data = self.ff.fetch(seq)
+        if len(data) <= self.maxMem:
+            self.seqD[seq] = data
+            self.nBases += len(data)
+            while self.nBases > self.maxMem:
+                self.nBases -= len(self.seqD.popitem(last=False)[1])
+        return data
+
+    def fetch(self, seq, start, end):
+        """Return the bases from 0-based position `start` to `end`
+        (not included) of the sequence with name `seq`.
+
+        :rtype: str
+
+        """
+        if isinstance(self.ff, FaSeq):
+            return self.ff.fetch(seq, start, end)
+        if (seq not in self.seqD) and \
+           (self.ff.get_reference_length(seq) > self.maxMem):
+            return self.ff.fetch(seq, start, end)
+        return self.get_seq(seq)[start:end]
+
+    def close(self):
+        if not isinstance(self.ff, FaSeq):
+            self.ff.close()
+        self.seqD.clear()
+        self.nBases = 0
 
 
 def init_seq(faFileName, maxskip=50, name=None):
@@ -743,12 +1041,13 @@ def open_seq(faFileName, maxskip=50, name=None):
     faFile.close()
     test_sequence(fastaSeq)
 
-    for s in fastaSeq.seqL:
+    for (i, s) in enumerate(fastaSeq.seqL):
         fastaSeq.seqD[s.name] = s
+        fastaSeq.seqIndD[s.name] = i
     return fastaSeq
 
 
-def save_as_vcf(faSeq, ref, VCFFileName):
+def save_as_vcf(faSeq, ref, VCFFileName, bgzip=False, batchSize=10000):
     """Save the given :classL`FaSeq` in VCF format.
 
     In general, we want to convert a fasta file with various
@@ -779,69 +1078,62 @@ def save_as_vcf(faSeq, ref, VCFFileName):
       INFO   = .
       FORMAT = GT
 
+    The alignment is processed in chunks of *batchSize* columns.  The
+    variable columns of a chunk are found with a single comparison of
+    the encoded chunk against the reference.  Only for these columns,
+    the ALT bases and the genotypes are extracted and the VCF lines
+    of the chunk are written at once.
+
+    If *bgzip* is True, the output is compressed with BGZF and a tabix
+    index is created, so that the file can directly be used by the
+    :class:`CFWriter <cflib.cf.CFWriter>`.  In this case,
+    *VCFFileName* has to end with '.gz'.
+
     :param FaSeq faSeq: :class:`FaSeq` object to be converted.
     :param Seq ref: :class:`Seq <cflib.seqbase.Seq>` object of the
                     reference sequence.
     :param str VCFFileName: Name of the VCF output file.
+    :param Boolean bgzip: Optional; compress the output with BGZF and
+                          index it with tabix.
+    :param int batchSize: Optional; number of alignment columns that
+                          are processed at once.
 
     """
-    def get_altBases_string(sAltBases):
-        """Return ALT bases string from given `sAltBases`."""
-        length = len(sAltBases)
-        if length == 0:
-            return ''
-        string = str(sAltBases[0])
-        if length > 1:
-            for i in range(1, length):
-                string += ',' + sAltBases[i]
-        return string
-
-    def get_indiv_string(indivData, altBases, sAltBases):
-        """Return the string of the individual data.
-
-        Return the string extracted from the indivudal data
-        `indivData` with SNPs `altBases`. `sAltBases` is the string
-        with the alternative bases.
-
-        E.g.:
-        REF = A
-        ALT = C,G
-        individual i1 has A
-        individual i2 has C
-        individual i3 has G
-
-        Then the string should look like:
-        '0\t1\t2'
-        -> 0 for REF, 1 for first ALT and 2 for second ALT
+    def get_vcf_lines(alignM, refA, cols, start):
+        """Return the VCF file lines of the variable columns *cols*.
+
+        *alignM* and *refA* are the encoded chunk of the alignment and
+        the reference that starts at 0-based position *start*.
 
         """
-        length = len(indivData)
-        if not (indivData[0] in altBases):
-            string = '0'
+        colM = alignM[:, cols].T
+        refL = refA[cols]
+        nCols = len(cols)
+        rows = np.arange(nCols)
+        # Present bases of each column without the reference base.
+        # Sorted by their ASCII code, the ranks are the ALT indices.
+        presM = np.zeros((nCols, 256), dtype=bool)
+        presM[rows[:, np.newaxis], colM] = True
+        presM[rows, refL] = False
+        rankM = np.cumsum(presM, axis=1)
+        gtM = np.where(colM == refL[:, np.newaxis], 0,
+                       rankM[rows[:, np.newaxis], colM])
+        if rankM[:, -1].max() < 10:
+            # Single digit genotypes; build the strings in one go.
+            gtM = (gtM + ord('0')).astype(np.uint8)
+            gtM = np.insert(gtM, range(1, faSeq.nSpecies), ord('\t'),
+                            axis=1)
+            gtL = [bytes(r).decode() for r in gtM]
         else:
-            string = str(sAltBases.index(indivData[0]) + 1)
-        if length > 1:
-            for i in range(1, len(indivData)):
-                if not (indivData[i] in altBases):
-                    string += '\t' + '0'
-                else:
-                    string += '\t' + str(sAltBases.index(indivData[i]) + 1)
-        return string
-
-    def get_vcf_line(chromName, pos,
-                     refBase, altBaseString, indivString):
-        """Print a VCF file line with given data to file `VCFFile`."""
-        string = chromName + '\t'
-        string += str(pos) + '\t'
-        string += '.' + '\t'    # id
-        string += refBase + '\t'
-        string += altBaseString + '\t'
-        string += '.' + '\t'    # qual
-        string += '.' + '\t'    # filter
-        string += '.' + '\t'    # info
-        string += "GT" + '\t'   # format
-        string += indivString
-        return string
+            gtL = ['\t'.join(map(str, r)) for r in gtM]
+        lnL = []
+        for i in range(nCols):
+            altL = np.flatnonzero(presM[i]).astype(np.uint8)
+            lnL.append('\t'.join([ref.name, str(start+cols[i]+1), '.',
+                                  chr(refL[i]),
+                                  ','.join(bytes(altL).decode()),
+                                  '.', '.', '.', 'GT', gtL[i]]))
+        return lnL
 
     if (not isinstance(faSeq, FaSeq)):
         raise sb.SequenceDataError("`faSeq` is not an FaSeq object.")
@@ -849,31 +1141,36 @@ def save_as_vcf(faSeq, ref, VCFFileName):
         raise sb.SequenceDataError("`ref` is not a Seq object.")
     if faSeq.nSpecies == 0:
         raise sb.SequenceDataError("`faSeq` has no saved sequences.")
+    if (bgzip is True) and (not VCFFileName.endswith('.gz')):
+        raise sb.SequenceDataError(
+            "`VCFFileName` has to end with .gz if `bgzip` is set.")
     for i in range(0, faSeq.nSpecies):
         if faSeq.seqL[i].dataLen != ref.dataLen:
             raise sb.SequenceDataError(
                 "Sequence " + faSeq.seqL[i].name +
                 " has different length than reference.")
-    VCFFile = sb.gz_open(VCFFileName, mode='w')
-    print(vcf.get_header_line_string(faSeq.get_seq_names()), file=VCFFile)
-    # loop over bases
-    refBase = ''
-    for i in range(0, ref.dataLen):
-        refBase = ref.data[i]
-        altBases = set()
-        indivData = []
-        # loop over sequences in faSeq and check if there is a SNP
-        for s in range(0, faSeq.nSpecies):
-            indivData.append(faSeq.seqL[s].data[i])
-            if faSeq.seqL[s].data[i] != refBase:
-                altBases.add(faSeq.seqL[s].data[i])
-        sAltBases = sorted(altBases)
-        altBaseString = get_altBases_string(sAltBases)
-        indivString = get_indiv_string(indivData, altBases, sAltBases)
-        if altBases != set():
-            print(
-                get_vcf_line(ref.name, i+1, refBase,
-                             altBaseString, indivString),
-                file=VCFFile)
+    refData = str(ref.data)
+
+    if bgzip is True:
+        VCFFile = ps.BGZFile(VCFFileName, mode='wb')
+
+        def write(string):
+            VCFFile.write(string.encode())
+    else:
+        VCFFile = sb.gz_open(VCFFileName, mode='w')
+        write = VCFFile.write
+    write(vcf.get_header_line_string(faSeq.get_seq_names()) + '\n')
+    for start in range(0, ref.dataLen, batchSize):
+        end = start + batchSize
+        alignM = np.vstack([sb.encode_seq(str(s.data[start:end]), lower=False)
+                            for s in faSeq.seqL])
+        refA = sb.encode_seq(refData[start:end], lower=False)
+        # Columns that differ from the reference in at least one sequence.
+        cols = np.flatnonzero(np.any(alignM != refA, axis=0))
+        if len(cols) > 0:
+            lnL = get_vcf_lines(alignM, refA, cols, start)
+            write('\n'.join(lnL) + '\n')
     VCFFile.close()
+    if bgzip is True:
+        ps.tabix_index(VCFFileName, preset='vcf', force=True)
     return
@@ -20,6 +20,8 @@ import cflib.seqbase as sb
 
 class Exon():
     """An exon with start and end position."""
+    __slots__ = ('start', 'end')
+
     def __init__(self, start, end):
         self.start = start
         self.end = end
@@ -27,6 +29,9 @@ class Exon():
 
 class Gene():
     """A gene stored in a GP file line."""
+    __slots__ = ('name', 'chrom', 'orientation', 'start', 'end', 'nr_exons',
+                 'exons', 'is_rc')
+
     def __init__(self, ln):
         lnl = ln.split()
         self.name = lnl[0]
@@ -73,14 +78,18 @@ class GPStream():
     """Read a GP file line per line.
 
     In order to interpret the data, a reference fasta file name is
-    needed.
+    needed.  The chromosomes of the reference are only read when they
+    are needed (cf. :class:`FaRef <cflib.fasta.FaRef>`); at most
+    *maxMem* bases are kept in memory.  Since the genes in GP files
+    are mostly grouped by chromosome, only a few chromosomes need to
+    be read at a time.
 
     """
 
-    def __init__(self, fn, rf_fn):
+    def __init__(self, fn, rf_fn, maxMem=2**29):
         self.fn = fn
         self.fo = open(fn, mode="r")
-        self.rf = fasta.open_seq(rf_fn)
+        self.rf = fasta.FaRef(rf_fn, maxMem)
         self.read_next_gene()
 
     def read_next_gene(self):
@@ -99,6 +108,7 @@ class GPStream():
 
     def close(self):
         self.fo.close()
+        self.rf.close()
 
 
 def convert_exon_to_seq(gene, exon, inframe, rf):
@@ -106,8 +116,9 @@ def convert_exon_to_seq(gene, exon, inframe, rf):
 
     The `Gene()` only contains the positional information.  To get a
     valid sequence, information from a reference genome `rf`
-    `fasta.FaSeq()` is needed.  The `inframe` should give the position
-    in the triplet of the first base of the exon (0, 1 or 2).
+    (`fasta.FaRef()` or `fasta.FaSeq()`) is needed.  The `inframe`
+    should give the position in the triplet of the first base of the
+    exon (0, 1 or 2).
 
     For the baboon GP file, the `inframe` is 0 for the first exon.
     The next exon always continues with the outframe of the previous
@@ -121,7 +132,7 @@ def convert_exon_to_seq(gene, exon, inframe, rf):
     # TODO: How are exon start and end defined?  Here: Indexing starts
     # with 0 but the exon end is not included in the sequence, this
     # seems to be most coherent with start codons in the data.
-    seq.data = rf.seqD[gene.chrom].data[exon.start:exon.end]
+    seq.data = rf.fetch(gene.chrom, exon.start, exon.end)
     seq.dataLen = exon.end - exon.start
     # import pdb; pdb.set_trace()
     # Get orientation.
@@ -8,11 +8,15 @@ This library contains functions that are used by PoMo.
 """
 
 import argparse
-import random
+import functools
+import json
 from scipy.special import comb as choose
+from scipy.stats import binom as binomDist
+import numpy as np
 import cflib as lp
 import os
 import pdb
+import tempfile
 import time
 
 
@@ -25,6 +29,7 @@ codons = ["aaa", "aac", "aag", "aat", "aca", "acc", "acg", "act",
           "gga", "ggc", "ggg", "ggt", "gta", "gtc", "gtg", "gtt",
           "taa", "tac", "tag", "tat", "tca", "tcc", "tcg", "tct",
           "tga", "tgc"]
+codonsA = np.array(codons)
 nucs = ["A", "C", "G", "T"]
 
 
@@ -144,69 +149,103 @@ def binom(s, p, n):
     return prob
 
 
-def probability_matrix(n):
-    """Create probability matrices for the HyPhy batch file."""
-    o = n-1
-    #ignore values below this threshold (keeps the matrix sparse,
-    #avoiding increase in computational demands)
-    lim = 0.0001
-    s = ""
+def get_probability_matrix(n, N=10, lim=0.0001):
+    """Get the sampling probability matrix as an array.
+
+    The rows and columns are the 4 + 6*(N-1) PoMo states (4 fixed
+    states and N-1 frequencies for each of the 6 pairs of bases).  The
+    matrix is filled with the binomial probabilities of sampling the
+    data states with sample size *n* from the PoMo states.  All
+    entries are computed at once on grids of sample counts and
+    frequencies.
+
+    :param int n: Sample size.
+    :param int N: Optional; virtual population size.
+    :param float lim: Optional; probabilities below this threshold are
+      set to 0 (keeps the matrix sparse, avoiding increase in
+      computational demands).
+
+    :rtype: numpy.ndarray
+
+    """
     polys = [[0, 1], [0, 2], [0, 3], [1, 2], [1, 3], [2, 3]]
+    nFre = N - 1
+    nStates = 4 + 6 * nFre
+    m = np.zeros((nStates, nStates))
+    m[np.arange(4), np.arange(4)] = 1.0
+    # Frequencies of the second base of the polymorphic states.
+    fre = np.arange(1, nFre + 1) / N
+    revFre = np.arange(nFre, 0, -1) / N
+    # Probabilities of sampling *s* times the second base; only
+    # sample counts below the sample size are valid data states.
+    s = np.arange(1, nFre + 1)
+    block = binomDist.pmf(s[None, :], n, fre[:, None])
+    block[:, s >= n] = 0.0
+    block[block <= lim] = 0.0
+    # Probabilities of sampling only the first or only the second base.
+    only1 = binomDist.pmf(n, n, revFre)
+    only2 = binomDist.pmf(n, n, fre)
+    only1[only1 <= lim] = 0.0
+    only2[only2 <= lim] = 0.0
+    for (pol, (b1, b2)) in enumerate(polys):
+        rows = slice(4 + pol * nFre, 4 + (pol + 1) * nFre)
+        m[rows, b1] = only1
+        m[rows, b2] = only2
+        m[rows, rows] = block
+    return m
+
+
+@functools.lru_cache(maxsize=None)
+def get_probability_matrix_string(n, N=10, lim=0.0001):
+    """Get the probability matrix in HyPhy format (cached).
+
+    Cf. :func:`get_probability_matrix` and :func:`probability_matrix`.
 
-    #write matrix
-    s += "matrixto"+str(o+1)+" ={\n"
-    for nucs in range(4):
-        s += "{"
-        for l in range(58-1):
-            if l == nucs:
-                s += "1.0,"
-            else:
-                s += "0.0,"
-        s += "0.0}\n"
-    for pol in range(6):
-        for fre in range(9):
-            s += "{"
-            for nucs in range(4):
-                if nucs == polys[pol][0]:
-                    val = binom(o+1, float(9-fre)/10, o+1)
-                    if val > lim:
-                        s += str(val)+","
-                    else:
-                        s += "0.0,"
-                elif nucs == polys[pol][1]:
-                    val = binom(o+1, float(fre+1)/10, o+1)
-                    if val > lim:
-                        s += str(val)+","
-                    else:
-                        s += "0.0,"
-                else:
-                    s += "0.0,"
-            for pol2 in range(6):
-                for fre2 in range(9):
-                    if pol == pol2:
-                        if fre2 < o:
-                            val = binom(fre2+1, float(fre+1)/10, o+1)
-                            if val > lim:
-                                s += str(val)
-                            else:
-                                s += "0.0"
-                        else:
-                            s += "0.0"
-                        if pol2*fre2 != 40:
-                            s += ","
-                        else:
-                            s += "}\n"
-                    else:
-                        if pol2*fre2 != 40:
-                            s += "0.0,"
-                        else:
-                            s += "0.0}\n"
+    """
+    m = get_probability_matrix(n, N, lim)
+    o = n-1
+    s = "matrixto"+str(o+1)+" ={\n"
+    s += ''.join("{" + ','.join(map(str, row)) + "}\n" for row in m.tolist())
     s += "};\n\n\n\n"
     s += "Model Mto" + str(o+1) + " = (\"matrixto" + \
          str(o+1) + "\", Freqs, EXPLICIT_FORM_MATRIX_EXPONENTIAL);\n\n"
     return s
 
 
+def probability_matrix(n, N=10, lim=0.0001, cache_dir=None):
+    """Create probability matrices for the HyPhy batch file.
+
+    The matrices are cached for each (n, N, lim) (cf.
+    :func:`get_probability_matrix`).  If *cache_dir* is given, they
+    are also saved to and read from this directory so that they are
+    only computed once across runs.
+
+    :param int n: Sample size.
+    :param int N: Optional; virtual population size.
+    :param float lim: Optional; threshold of ignored probabilities.
+    :param str cache_dir: Optional; directory of the on-disk cache.
+
+    :rtype: str
+
+    """
+    if cache_dir is None:
+        return get_probability_matrix_string(n, N, lim)
+    cacheFN = os.path.join(cache_dir, "probability_matrix_" + str(n) +
+                           "_" + str(N) + "_" + repr(lim) + ".bf")
+    try:
+        with open(cacheFN) as f:
+            return f.read()
+    except OSError:
+        pass
+    s = get_probability_matrix_string(n, N, lim)
+    os.makedirs(cache_dir, exist_ok=True)
+    tempFN = cacheFN + "." + str(os.getpid()) + ".tmp"
+    with open(tempFN, "w") as f:
+        f.write(s)
+    os.replace(tempFN, cacheFN)
+    return s
+
+
 def get_species_from_cf_headerline(line):
     """Get the number of species and the names fom a counts format header line.
 
@@ -253,11 +292,438 @@ def get_data_from_cf_line(cfStr):
     return (n_samples, data)
 
 
+def get_coverage(sp_data):
+    """Get the coverage of each species at each site.
+
+    :param sp_data: Array with the counts (sp_data[pos][species][base]).
+
+    :rtype: numpy.ndarray of shape (nSites, nSpecies)
+
+    """
+    return sp_data.sum(axis=2, dtype=np.int64)
+
+
+def get_coverage_mask(sp_cov, min_cov):
+    """Get the sites where all species are sufficiently covered.
+
+    :param sp_cov: Array with the coverage of each species at each site
+      (cf. :func:`get_coverage`).
+    :param [int] min_cov: Minimum coverage of each species.
+
+    :rtype: Boolean numpy.ndarray of length nSites
+
+    """
+    return (sp_cov >= np.asarray(min_cov, dtype=np.int64)).all(axis=1)
+
+
+def get_coverage_histogram(sp_cov, counts=None):
+    """Get the histogram of the coverage profiles.
+
+    :param sp_cov: Array with the coverage of each species at each site
+      (cf. :func:`get_coverage`).
+    :param counts: Optional; number of sites with the coverage
+      *sp_cov[i]*.  Defaults to 1 for each row.
+
+    :rtype: (numpy.ndarray profiles, numpy.ndarray counts), the
+      distinct rows of *sp_cov* and their number of sites.
+
+    """
+    sp_cov = np.ascontiguousarray(sp_cov, dtype=np.int64)
+    if counts is None:
+        counts = np.ones(len(sp_cov), dtype=np.int64)
+    rowT = np.dtype((np.void, sp_cov.dtype.itemsize * sp_cov.shape[1]))
+    (_, uI, invI) = np.unique(sp_cov.view(rowT).ravel(), return_index=True,
+                              return_inverse=True)
+    return (sp_cov[uI], np.bincount(invI.ravel(), weights=counts,
+                                    minlength=len(uI)).astype(np.int64))
+
+
+def get_downsampled_sizes(sp_cov, sp_samples, thresh, leng=None,
+                          counts=None):
+    """Lower the sample sizes until enough sites are covered.
+
+    A site is covered if the coverage of each species is at least its
+    sample size.  As long as the fraction of covered sites is below
+    *thresh*, the sample size of one species is lowered.  The species
+    and the decrement are chosen such that the smallest decrement of
+    a single species covers sites, and among the species the one that
+    covers most sites (the first one, if there are ties).
+
+    Instead of the sites, the histogram of the distinct coverage
+    profiles (the coverages truncated at the sample sizes) is
+    traversed.
+
+    :param sp_cov: Array with the coverage of each species at each site
+      (cf. :func:`get_coverage`).
+    :param [int] sp_samples: Sample sizes of the species.
+    :param float thresh: Minimum fraction of covered sites.
+    :param int leng: Optional; total number of sites (defaults to the
+      number of sites in *sp_cov*).
+    :param counts: Optional; number of sites with the coverage
+      *sp_cov[i]* (e.g. a histogram of coverage profiles, cf.
+      :func:`get_coverage_histogram`).  Defaults to 1 for each row.
+
+    :rtype: [int], the new sample sizes; None if the threshold can not
+      be reached.
+
+    """
+    if counts is None:
+        counts = np.ones(len(sp_cov), dtype=np.int64)
+    else:
+        counts = np.asarray(counts, dtype=np.int64)
+    if leng is None:
+        leng = int(counts.sum())
+    sizes = np.array(sp_samples, dtype=np.int64)
+    profiles = np.minimum(sp_cov, sizes)
+    isCovered = (profiles == sizes).all(axis=1)
+    covered = int(counts[isCovered].sum())
+    # Histogram of the profiles of the sites that are not covered.
+    (profiles, counts) = get_coverage_histogram(profiles[~isCovered],
+                                                counts[~isCovered])
+    n_species = len(sizes)
+    while float(covered)/leng < thresh:
+        # Sites that would be covered if the sample size of exactly
+        # one species was lowered by its deficit.
+        deficient = profiles < sizes
+        single = deficient.sum(axis=1) == 1
+        spI = deficient[single].argmax(axis=1)
+        deficit = sizes[spI] - profiles[single][np.arange(len(spI)), spI]
+        cnt = counts[single]
+        # The smallest deficit of each species and the number of sites
+        # that have it.
+        minDeficit = np.full(n_species, np.iinfo(np.int64).max)
+        np.minimum.at(minDeficit, spI, deficit)
+        advs = np.zeros(n_species, dtype=np.int64)
+        atMin = deficit == minDeficit[spI]
+        np.add.at(advs, spI[atMin], cnt[atMin])
+        max_ind = int(advs.argmax())
+        if advs[max_ind] == 0:
+            return None
+        sizes[max_ind] -= minDeficit[max_ind]
+        covered += int(advs[max_ind])
+    return sizes.tolist()
+
+
+@functools.lru_cache(maxsize=None)
+def get_state_table(n, N=10):
+    """Get the lookup table of the PoMo states of sampled data.
+
+    *table[i1][i2][c]* is the index of the PoMo state (cf.
+    :data:`codons`) of a site where *c* out of *n* samples are base
+    *i2* and the others are base *i1* (*i1* < *i2*).
+
+    :param int n: Sample size.
+    :param int N: Optional; virtual population size.
+
+    :rtype: numpy.ndarray of shape (4, 4, n+1)
+
+    """
+    table = np.full((4, 4, n + 1), -1, dtype=np.int64)
+    pol = 0
+    for i1 in range(4):
+        for i2 in range(i1 + 1, 4):
+            table[i1, i2, 0] = i1
+            table[i1, i2, n] = i2
+            table[i1, i2, 1:n] = 4 + pol*(N-1) + np.arange(n - 1)
+            pol += 1
+    return table
+
+
+def get_hyphy_states(counts, n, N=10, rng=None):
+    """Get the PoMo states of the sites of one species.
+
+    At each site, only the two most frequent bases are considered.  If
+    they have been sampled more than *n* times, *n* samples are drawn
+    without replacement (hypergeometric distribution); all sites are
+    resampled at once.  The states are then looked up in the table of
+    :func:`get_state_table`.
+
+    :param counts: Array with the base counts of the species at each
+      site (shape (nSites, 4)).
+    :param int n: Sample size.
+    :param int N: Optional; virtual population size.
+    :param rng: Optional; :class:`numpy.random.Generator`.
+
+    :rtype: (numpy.ndarray states, numpy.ndarray consensus), the
+      indices of the PoMo states and of the most frequent bases (cf.
+      :data:`codons`).
+
+    """
+    if rng is None:
+        rng = np.random.default_rng()
+    counts = np.array(counts, dtype=np.int64)
+    siteI = np.arange(len(counts))
+    # Most frequent base (first one, if there are ties).
+    i1A = counts.argmax(axis=1)
+    c1A = counts[siteI, i1A]
+    # Second most frequent base.
+    counts[siteI, i1A] = 0
+    i2A = counts.argmax(axis=1)
+    c2A = counts[siteI, i2A]
+    poly = c2A > 0
+    resample = poly & (c1A + c2A > n)
+    c1A[resample] = rng.hypergeometric(c1A[resample], c2A[resample], n)
+    c2A[resample] = n - c1A[resample]
+    # Count of the base with the higher index.
+    cHiA = np.where(i1A < i2A, c2A, c1A)
+    table = get_state_table(n, N)
+    statesA = i1A.copy()
+    statesA[poly] = table[np.minimum(i1A, i2A)[poly],
+                          np.maximum(i1A, i2A)[poly], cHiA[poly]]
+    return (statesA, i1A)
+
+
+def scan_cf_coverage(fn, N, blockSize=100000):
+    """Collect the coverage statistics of a counts format file.
+
+    The file is read block by block and only the statistics that are
+    needed for downsampling are kept (cf.
+    :func:`get_downsampled_sizes`).
+
+    :param str fn: Counts format file name.
+    :param int N: Virtual population size; coverages are truncated at
+      *N*.
+    :param int blockSize: Optional; number of lines read at once.
+
+    :rtype: (sp_names, leng, max_cov, profiles, counts), the species
+      names, the number of sites, the maximum coverage of each
+      species and the histogram of the truncated coverage profiles of
+      the sites where all species are covered (cf.
+      :func:`get_coverage_histogram`).
+
+    """
+    cfStr = lp.cf.CFStream(fn)
+    sp_names = cfStr.indivL
+    n_species = len(sp_names)
+    leng = 0
+    max_cov = np.zeros(n_species, dtype=np.int64)
+    profiles = np.zeros((0, n_species), dtype=np.int64)
+    counts = np.zeros(0, dtype=np.int64)
+    for block in lp.cf.iter_cf_blocks(cfStr, blockSize):
+        sp_cov = get_coverage(block)
+        leng += len(sp_cov)
+        max_cov = np.maximum(max_cov, sp_cov.max(axis=0))
+        sp_cov = np.minimum(sp_cov[get_coverage_mask(sp_cov, [1] *
+                                                     n_species)], N)
+        (profiles, counts) = get_coverage_histogram(
+            np.concatenate((profiles, sp_cov)),
+            np.concatenate((counts, np.ones(len(sp_cov), dtype=np.int64))))
+    cfStr.close()
+    return (sp_names, leng, max_cov.tolist(), profiles, counts)
+
+
+def write_hyphy_data(sp_data, sp_samples, N, rng,
+                     PoModatafile, PoModatafile_cons):
+    """Write the HyPhy input files.
+
+    The data of each species is written as one sequence of PoMo
+    states to *PoModatafile* and as one sequence of the most frequent
+    bases to *PoModatafile_cons* (cf. :func:`get_hyphy_states`).
+
+    :param sp_data: Array with the counts (sp_data[pos][species][base]).
+    :param [int] sp_samples: Sample sizes of the species.
+    :param int N: Virtual population size.
+    :param rng: :class:`numpy.random.Generator`.
+    :param fo PoModatafile: HyPhy input file.
+    :param fo PoModatafile_cons: HyPhy input file with consensus bases.
+
+    """
+    for l in range(len(sp_samples)):
+        (statesA, consA) = get_hyphy_states(sp_data[:, l, :], sp_samples[l],
+                                            N, rng)
+        PoModatafile.write(">s" + str(l+1) + "\n")
+        PoModatafile_cons.write(">s" + str(l+1) + "\n")
+        PoModatafile.write(''.join(codonsA[statesA].tolist()))
+        PoModatafile_cons.write(''.join(codonsA[consA].tolist()))
+        PoModatafile.write("\n")
+        PoModatafile_cons.write("\n")
+
+
+def write_hyphy_data_stream(fn, sp_samples, N, rng,
+                            PoModatafile, PoModatafile_cons,
+                            blockSize=100000):
+    """Write the HyPhy input files while reading the counts file.
+
+    Like :func:`write_hyphy_data` but the counts format file is read
+    block by block.  Sites where some species do not have sufficient
+    coverage are skipped.  The sequences of the species are collected
+    block by block in a single temporary file and copied to the output
+    files species by species at the end.
+
+    :param str fn: Counts format file name.
+    :param [int] sp_samples: Sample sizes of the species.
+    :param int N: Virtual population size.
+    :param rng: :class:`numpy.random.Generator`.
+    :param fo PoModatafile: HyPhy input file.
+    :param fo PoModatafile_cons: HyPhy input file with consensus bases.
+    :param int blockSize: Optional; number of lines read at once.
+
+    """
+    n_species = len(sp_samples)
+    # Offset and lengths of the sequence and the consensus sequence of
+    # each block in the temporary file, for each species.
+    pieces = [[] for l in range(n_species)]
+    with tempfile.TemporaryFile() as temp:
+        cfStr = lp.cf.CFStream(fn)
+        for block in lp.cf.iter_cf_blocks(cfStr, blockSize):
+            block = block[get_coverage_mask(get_coverage(block),
+                                            sp_samples)]
+            for l in range(n_species):
+                (statesA, consA) = get_hyphy_states(block[:, l, :],
+                                                    sp_samples[l], N, rng)
+                data = ''.join(codonsA[statesA].tolist()).encode()
+                cons = ''.join(codonsA[consA].tolist()).encode()
+                pieces[l].append((temp.tell(), len(data), len(cons)))
+                temp.write(data)
+                temp.write(cons)
+        cfStr.close()
+        for l in range(n_species):
+            PoModatafile.write(">s" + str(l+1) + "\n")
+            PoModatafile_cons.write(">s" + str(l+1) + "\n")
+            for (offset, nData, nCons) in pieces[l]:
+                temp.seek(offset)
+                PoModatafile.write(temp.read(nData).decode())
+                PoModatafile_cons.write(temp.read(nCons).decode())
+            PoModatafile.write("\n")
+            PoModatafile_cons.write("\n")
+
+
+def is_stdout_print(line):
+    """Check if *line* of a HyPhy batch file prints to stdout."""
+    linelist = line.split()
+    return (len(linelist) > 1 and linelist[0] == "fprintf" and
+            linelist[1] == "(stdout,")
+
+
+def parse_batch_template(fn, marker, quiet=True):
+    """Parse a HyPhy batch file template.
+
+    The template is split into sections between which the model
+    definition, the probability matrices and the sample sizes are
+    inserted (cf. :func:`render_batch_template`):
+
+    - *head*, up to and including "/\\*Define global parameters\\*/";
+      the 23 lines following it are replaced by the model definition;
+    - *body*, up to and including the line *marker*; it is followed by
+      the probability matrices;
+    - *tail*, the rest of the template, split at the "\\tNsamples"
+      lines, which are replaced by the sample sizes.
+
+    If *quiet* is True, the lines of the body and the tail that print
+    to stdout are commented out.
+
+    :param str fn: File name of the template.
+    :param str marker: Line (with newline) that ends the body.
+    :param Boolean quiet: Optional; comment out prints to stdout.
+
+    :raises: :class:`ValueError`, if a section is not found.
+
+    :rtype: (str head, str body, [str] tail)
+
+    """
+    def comment(line):
+        if quiet is True and is_stdout_print(line):
+            return "/*" + line.replace("\n", "") + "*/\n"
+        return line
+
+    with open(fn) as f:
+        lineL = f.readlines()
+    try:
+        i = lineL.index("/*Define global parameters*/\n") + 1
+        j = lineL.index(marker, i + 23) + 1
+    except ValueError:
+        raise ValueError("HyPhy batch file template " + fn +
+                         " does not contain all sections.")
+    tail = [""]
+    for line in lineL[j:]:
+        if line.split("=")[0] == "\tNsamples":
+            tail.append("")
+        else:
+            tail[-1] += comment(line)
+    return (''.join(lineL[:i]), ''.join(map(comment, lineL[i+23:j])), tail)
+
+
+@functools.lru_cache(maxsize=None)
+def get_batch_template(fn, marker, quiet=True, stamp=None):
+    """Get the parsed HyPhy batch file template (cached).
+
+    Cf. :func:`parse_batch_template` and :func:`batch_template`.
+    *stamp* identifies the version of the template file.
+
+    """
+    return parse_batch_template(fn, marker, quiet)
+
+
+def batch_template(fn, marker, quiet=True, cache_dir=None):
+    """Get a parsed HyPhy batch file template.
+
+    The parsed templates are cached for each file version (modification
+    time and size) (cf. :func:`parse_batch_template`).  If *cache_dir*
+    is given, they are also saved to and read from this directory so
+    that they are only parsed once across runs.
+
+    :param str fn: File name of the template.
+    :param str marker: Line (with newline) that ends the body.
+    :param Boolean quiet: Optional; comment out prints to stdout.
+    :param str cache_dir: Optional; directory of the on-disk cache.
+
+    :rtype: (str head, str body, [str] tail)
+
+    """
+    st = os.stat(fn)
+    stamp = [os.path.abspath(fn), marker, quiet, st.st_mtime_ns, st.st_size]
+    if cache_dir is None:
+        return get_batch_template(fn, marker, quiet, tuple(stamp))
+    cacheFN = os.path.join(cache_dir, "batch_template_" +
+                           os.path.basename(fn) + "_" +
+                           str(int(quiet)) + ".json")
+    try:
+        with open(cacheFN) as f:
+            cache = json.load(f)
+        if cache["stamp"] == stamp:
+            return tuple(cache["template"])
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+    tmpl = get_batch_template(fn, marker, quiet, tuple(stamp))
+    os.makedirs(cache_dir, exist_ok=True)
+    tempFN = cacheFN + "." + str(os.getpid()) + ".tmp"
+    with open(tempFN, "w") as f:
+        json.dump({"stamp": stamp, "template": tmpl}, f)
+    os.replace(tempFN, cacheFN)
+    return tmpl
+
+
+def render_batch_template(outFN, tmpl, model, matrices, sp_samples):
+    """Write a HyPhy batch file from a parsed template.
+
+    Each section is written at once.
+
+    :param str outFN: Name of the batch file.
+    :param tmpl: Parsed template (cf. :func:`batch_template`).
+    :param [str] model: Lines of the model definition (mutation and
+      selection models and their gammas).
+    :param str matrices: Probability matrices (cf.
+      :func:`probability_matrix`).
+    :param [int] sp_samples: Sample sizes of the species.
+
+    """
+    (head, body, tail) = tmpl
+    nsamples = "\tNsamples={{\"" + "\"}{\"".join(map(str, sp_samples)) + \
+               "\"}};\n"
+    with open(outFN, "w") as f:
+        f.write(head)
+        f.write(''.join(model))
+        f.write(body)
+        f.write(matrices)
+        f.write(nsamples.join(tail))
+
+
 def read_data_write_HyPhy_input(fn, N, thresh, path_bf,
                                 muts, mutgamma,
                                 sels, selgamma,
                                 PoModatafile, PoModatafile_cons,
-                                theta=None, vb=None):
+                                theta=None, vb=None, cache_dir=None,
+                                seed=None, stream=False):
     """Read the count data and write the HyPhy input file.
 
     The provided filename has to point to a data file in counts format
@@ -278,6 +744,16 @@ def read_data_write_HyPhy_input(fn, N, thresh, path_bf,
     :param str PoModatafile_cons: Path to HyPhy input file.
 
     :param Boolean vb: Verbosity.
+    :param str cache_dir: Optional; directory where the probability
+      matrices and the parsed batch file templates are cached (cf.
+      :func:`probability_matrix` and :func:`batch_template`).
+    :param int seed: Optional; seed of the random number generator
+      used for resampling (cf. :func:`get_hyphy_states`).
+    :param Boolean stream: Optional; do not keep the data in memory
+      but read the counts file twice.  The first pass only collects
+      the coverage histogram (cf. :func:`scan_cf_coverage`), the
+      second one writes the HyPhy input file (cf.
+      :func:`write_hyphy_data_stream`).
 
     :rtype: (int n_species, [str] sp_names, [str] sp_samples, Boolean all_one,
              float usr_def)
@@ -290,8 +766,8 @@ def read_data_write_HyPhy_input(fn, N, thresh, path_bf,
     sp_names = []
     # sample size of each species
     sp_samples = []
-    # actual data; it is a 3-dimensional array sp_data[species][pos][base]
-    sp_data = []
+    # actual data; it is a 3-dimensional array sp_data[pos][species][base]
+    sp_data = None
 
     # Check input file format.  If format is not counts file, convert
     # the file to counts format.  I have decided to do this because
@@ -299,14 +775,29 @@ def read_data_write_HyPhy_input(fn, N, thresh, path_bf,
     # files and the counts file type seems to be better.
 
     # Verbose HYPHY output only with -vv or more.
-    if (vb is None) or (vb == 1):
-        vbHyphy = None
+    vbHyphy = None
+    if (vb is not None) and (vb > 1):
+        vbHyphy = vb
 
     if vb is not None:
         print("Starting to read input file.")
 
+    def read_input(fn):
+        """Read the data or, if *stream* is set, only the coverage."""
+        if stream is True:
+            return scan_cf_coverage(fn, N)
+        else:
+            (sp_names, sp_data) = lp.cf.read_cf_array(fn)
+            sp_cov = get_coverage(sp_data)
+            # Sites where some species have coverage 0 are removed.
+            # The sites are only marked here and removed together
+            # with the sites that do not have sufficient coverage
+            # after downsampling.
+            keep = get_coverage_mask(sp_cov, [1] * len(sp_names))
+            return (sp_names, sp_data, sp_cov, keep)
+
     try:
-        cfStr = lp.cf.CFStream(fn)
+        inputT = read_input(fn)
     except lp.cf.NotACountsFormatFileError:
         print(fn + " is not in counts format.")
         print("Assuming fasta file format.")
@@ -322,54 +813,27 @@ def read_data_write_HyPhy_input(fn, N, thresh, path_bf,
         scripts folder.""")
         print("")
         fn = outFN
-        cfStr = lp.cf.CFStream(fn)
+        inputT = read_input(fn)
 
+    if stream is True:
+        # Histogram of the coverage profiles of the sites where all
+        # species are covered.
+        (sp_names, leng, sp_samples, profiles, counts) = inputT
+    else:
+        # Coverage of each species at each site; computed only once.
+        (sp_names, sp_data, sp_cov, keep) = inputT
+        leng = len(sp_data)
+        # The number of samples of a species is its maximum coverage.
+        sp_samples = sp_cov.max(axis=0).tolist()
+        profiles = sp_cov[keep]
+        counts = None
+    del inputT
     # Assign species names (first two columns are Chrom and Pos).
-    # (n_species, sp_names) = get_species_from_cf_headerline(line)
-    n_species = cfStr.nIndiv
-    sp_names = cfStr.indivL
-    # Initialize the number of species samples to 0.
-    for i in range(n_species):
-        sp_data.append([])
-        sp_samples.append(0)
-
-    # Read in the data.
-    leng = 0
-    while True:
-        leng += 1
-        (n_samples, data) = get_data_from_cf_line(cfStr)
-        # Update sp_data and the number of samples.
-        for i in range(n_species):
-            sp_data[i].append(data[i])
-            if n_samples[i] > sp_samples[i]:
-                sp_samples[i] = n_samples[i]
-        try:
-            cfStr.read_next_pos()
-        except ValueError:
-            break
+    n_species = len(sp_names)
 
     if vb is not None:
         print("Count file has been read.")
 
-    # Sites where some species have coverage 0 are removed
-    to_remove = []
-    for i in range(leng):
-        total = 1
-        for s in range(n_species):
-            summ = 0
-            for d in range(4):
-                summ += sp_data[s][i][d]
-            if summ == 0:
-                total = 0
-                break
-        if total == 0:
-            to_remove.append(i)
-    summ = 0
-    for i in range(len(to_remove)):
-        for s in range(n_species):
-            sp_data[s].pop(to_remove[i]-summ)
-        summ += 1
-
     # Debugging point to improve memory.
     # pdb.set_trace()
 
@@ -379,99 +843,34 @@ def read_data_write_HyPhy_input(fn, N, thresh, path_bf,
         if sp_samples[i] > N:
             sp_samples2.append(N)
             if (vb is not None):
-                print("Downsampling ", cfStr.indivL[i], ".", sep="")
+                print("Downsampling ", sp_names[i], ".", sep="")
         else:
             if (vb is not None):
-                print(cfStr.indivL[i], "does not need to be downsampled.")
+                print(sp_names[i], "does not need to be downsampled.")
             sp_samples2.append(sp_samples[i])
 
-    advantages = {}
-    covered = 0
-    for i in range(len(sp_data[0])):
-        summs = []
-        newlims = []
-        cov = 1
-        for s in range(n_species):
-            summs.append(0)
-            newlims.append(sp_samples2[s])
-            for d in range(4):
-                summs[s] += sp_data[s][i][d]
-            if summs[s] < sp_samples2[s]:
-                newlims[s] = summs[s]
-                cov = 0
-        limkey = ""
-        for ne in range(len(newlims)):
-            limkey += (str(newlims[ne])+":")
-        if cov == 1:
-            covered += 1
-        elif limkey in advantages.keys():
-            advantages[limkey] += 1
-        else:
-            advantages[limkey] = 1
-    ke = list(advantages)
-    while float(covered)/leng < thresh:
-        increments = []
-        advs = []
-        for s in range(n_species):
-            advs.append(0)
-            increments.append(1)
-            while advs[s] == 0:
-                for k in range(len(ke)):
-                    kl = ke[k].split(":")
-                    valid = 1
-                    for s2 in range(n_species):
-                        if s2 != s and int(kl[s2]) < sp_samples2[s2]:
-                            valid = 0
-                    if valid == 1 and int(kl[s]) >= \
-                       sp_samples2[s] - increments[s] \
-                       and int(kl[s]) < sp_samples2[s]:
-                        advs[s] += advantages[ke[k]]
-                if advs[s] == 0:
-                    if increments[s] < sp_samples2[s] - 1:
-                        increments[s] += 1
-                    else:
-                        break
-        max_ad = 0
-        max_ind = -1
-        for s in range(n_species):
-            if advs[s] > max_ad:
-                max_ad = advs[s]
-                max_ind = s
-        if max_ad == 0:
-            print("Downsampling with threshold " + str(thresh) +
-                  " reached an empasse. "
-                  "Please lower the threshold using option "
-                  "--DS, change downsampling strategy, "
-                  "or ask for assistance!\n")
-            exit()
-        sp_samples2[max_ind] = sp_samples2[max_ind] - increments[max_ind]
-        covered += max_ad
+    sp_samples2 = get_downsampled_sizes(profiles, sp_samples2, thresh,
+                                        leng, counts=counts)
+    del profiles
+    if sp_samples2 is None:
+        print("Downsampling with threshold " + str(thresh) +
+              " reached an empasse. "
+              "Please lower the threshold using option "
+              "--DS, change downsampling strategy, "
+              "or ask for assistance!\n")
+        exit()
     sp_samples = sp_samples2
 
     # Sites where some species have not sufficient coverage are removed
-    to_remove = []
-    for i in range(len(sp_data[0])):
-        total = 1
-        for s in range(n_species):
-            summ = 0
-            for d in range(4):
-                summ += sp_data[s][i][d]
-            if summ < sp_samples[s]:
-                total = 0
-                break
-        if total == 0:
-            to_remove.append(i)
-    summ = 0
-    for i in range(len(to_remove)):
-        for s in range(n_species):
-            sp_data[s].pop(to_remove[i]-summ)
-        summ += 1
-    leng = len(sp_data[0])
+    if stream is False:
+        keep &= get_coverage_mask(sp_cov, sp_samples)
+        sp_data = sp_data[keep]
+        del sp_cov
 
     print("Number of species: ", str(n_species), ".", sep="")
     print("Sample sizes effectively used: ", sp_samples, ".", sep="")
     if (vb is not None):
-        print("Names of species: ", cfStr.indivL, ".", sep="")
+        print("Names of species: ", sp_names, ".", sep="")
     all_one = True
     for i in range(n_species):
         if sp_samples[i] != 1:
@@ -500,7 +899,6 @@ def read_data_write_HyPhy_input(fn, N, thresh, path_bf,
 
     if (vb is not None):
         print("Theta has been set to be ", usr_def, ".", sep="")
-    cfStr.close()
 
     if n_species < 2:
         print("Error: cannot calculate a tree with fewer than 2 species.")
@@ -512,171 +910,27 @@ def read_data_write_HyPhy_input(fn, N, thresh, path_bf,
     # onlysampling = 1  # noqa
     # mbin = 0  # noqa
 
-    # Writing the HyPhy batch file for PoMo
-    newsamfile = open("PoMo10_root_only_sampling_preliminary_used.bf",
-                      "w")
-    samfile = open(path_bf + "PoMo10_root_only_sampling_preliminary.bf")
-    line = "\n"
-    while line != "/*Define global parameters*/\n":
-        line = samfile.readline()
-        linelist = line.split()
-        newsamfile.write(line)
-    for i in range(23):
-        line = samfile.readline()
-    for i in range(len(muts)):
-        newsamfile.write(muts[i])
-    for i in range(len(sels)):
-        newsamfile.write(sels[i])
-    for i in range(len(mutgamma)):
-        newsamfile.write(mutgamma[i])
-    for i in range(len(selgamma)):
-        newsamfile.write(selgamma[i])
-    while line != "/*Find Root*/\n":
-        line = samfile.readline()
-        linelist = line.split()
-        if len(linelist) > 1 and linelist[0] == "fprintf" \
-           and linelist[1] == "(stdout," and vbHyphy is None:
-            newsamfile.write("/*"+line.replace("\n", "")+"*/\n")
-        else:
-            newsamfile.write(line)
-    samples_num = []
-    for i in range(n_species):
-        if not (sp_samples[i] in samples_num):
-            newsamfile.write(lp.main.probability_matrix(sp_samples[i]))
-            samples_num.append(sp_samples[i])
-            newsamfile.write("\n\n\n")
-    line = "\n"
-    while line != "":
-        line = samfile.readline()
-        linelist = line.split()
-        if line.split("=")[0] == "\tNsamples":
-            newsamfile.write("\tNsamples={{\"")
-            for i in range(n_species-1):
-                newsamfile.write(str(sp_samples[i])+"\"}{\"")
-            newsamfile.write(str(sp_samples[n_species-1])+"\"}};\n")
-        elif len(linelist) > 1 and linelist[0] == "fprintf" \
-             and linelist[1] == "(stdout," and vbHyphy is None:  # noqa
-            newsamfile.write("/*"+line.replace("\n", "")+"*/\n")
-        else:
-            newsamfile.write(line)
-    samfile.close()
-    newsamfile.close()
-
-    # Writing the HyPhy batch file for PoMo with NNI
-    newsamfile = open("PoMo10_NNI_sampling_preliminary_used.bf", "w")
-    samfile = open(path_bf + "PoMo10_NNI_sampling.bf")
-    line = "\n"
-    while line != "/*Define global parameters*/\n":
-        line = samfile.readline()
-        linelist = line.split()
-        newsamfile.write(line)
-    for i in range(23):
-        line = samfile.readline()
-    for i in range(len(muts)):
-        newsamfile.write(muts[i])
-    for i in range(len(sels)):
-        newsamfile.write(sels[i])
-    for i in range(len(mutgamma)):
-        newsamfile.write(mutgamma[i])
-    for i in range(len(selgamma)):
-        newsamfile.write(selgamma[i])
-    while line != "/*pre-ML*/\n":
-        line = samfile.readline()
-        linelist = line.split()
-        if len(linelist) > 1 and linelist[0] == "fprintf" \
-           and linelist[1] == "(stdout," and vbHyphy is None:
-            newsamfile.write("/*" + line.replace("\n", "") + "*/\n")
-        else:
-            newsamfile.write(line)
-    samples_num = []
-    for i in range(n_species):
-        if not (sp_samples[i] in samples_num):
-            newsamfile.write(lp.main.probability_matrix(sp_samples[i]))
-            samples_num.append(sp_samples[i])
-            newsamfile.write("\n\n\n")
-    line = "\n"
-    while line != "":
-        line = samfile.readline()
-        linelist = line.split()
-        if line.split("=")[0] == "\tNsamples":
-            newsamfile.write("\tNsamples={{\"")
-            for i in range(n_species-1):
-                newsamfile.write(str(sp_samples[i])+"\"}{\"")
-            newsamfile.write(str(sp_samples[n_species-1])+"\"}};\n")
-        elif len(linelist) > 1 and linelist[0] == "fprintf" \
-             and linelist[1] == "(stdout," and vbHyphy is None:  # noqa
-            newsamfile.write("/*"+line.replace("\n", "")+"*/\n")
-        else:
-            newsamfile.write(line)
-    samfile.close()
-    newsamfile.close()
+    # Writing the HyPhy batch files for PoMo (root only and with NNI)
+    model = muts + sels + mutgamma + selgamma
+    matrices = ''.join(probability_matrix(n, cache_dir=cache_dir) + "\n\n\n"
+                       for n in sorted(set(sp_samples), key=sp_samples.index))
+    for (name, marker, outFN) in [
+            ("PoMo10_root_only_sampling_preliminary.bf", "/*Find Root*/\n",
+             "PoMo10_root_only_sampling_preliminary_used.bf"),
+            ("PoMo10_NNI_sampling.bf", "/*pre-ML*/\n",
+             "PoMo10_NNI_sampling_preliminary_used.bf")]:
+        tmpl = batch_template(path_bf + name, marker,
+                              quiet=(vbHyphy is None), cache_dir=cache_dir)
+        render_batch_template(outFN, tmpl, model, matrices, sp_samples)
 
     # creating HyPhy input file
-    for l in range(n_species):
-        PoModatafile.write(">s" + str(l+1) + "\n")
-        PoModatafile_cons.write(">s" + str(l+1) + "\n")
-        for m in range(leng):
-            count = sp_data[l][m]
-            p = count
-            maxcount = 0
-            i2 = -1
-            for j2 in range(4):
-                if p[j2] > maxcount:
-                    i1 = j2
-                    maxcount = p[j2]
-            refs3 = codons[i1]
-            maxcount = 0
-            for j2 in range(4):
-                if j2 != i1 and p[j2] > maxcount:
-                    i2 = j2
-                    maxcount = p[j2]
-            if i2 == -1:
-                refs = codons[i1]
-                # refs2 = codons[i1]
-            else:
-                if p[i1]+p[i2] > sp_samples[l]:
-                    count1 = p[i1]
-                    count2 = p[i2]
-                    newcount1 = 0
-                    newcount2 = 0
-                    for j5 in range(sp_samples[l]):
-                        num = random.random()
-                        if num < float(count1)/(count1+count2):
-                            newcount1 += 1
-                            count1 = count1 - 1
-                        else:
-                            newcount2 += 1
-                            count2 = count2 - 1
-                else:
-                    newcount1 = p[i1]
-                    newcount2 = p[i2]
-                if i1 > i2:
-                    i3 = i1
-                    i1 = i2
-                    i2 = i3
-                    newcount3 = newcount1
-                    newcount1 = newcount2
-                    newcount2 = newcount3
-                if newcount1 == sp_samples[l]:
-                    refs = codons[i1]
-                    # refs2 = codons[i1]
-                elif newcount2 == sp_samples[l]:
-                    refs = codons[i2]
-                    # refs2 = codons[i2]
-                else:
-                    pol = 0
-                    if i1 == 1:
-                        pol = 3
-                    if i1 == 2:
-                        pol = 5
-                    pol += (i2-(i1+1))
-                    p1 = newcount2 - 1
-                    pos = 4+pol*(N-1)+p1
-                    refs = codons[pos]
-            PoModatafile.write(refs)
-            PoModatafile_cons.write(refs3)
-        PoModatafile.write("\n")
-        PoModatafile_cons.write("\n")
+    rng = np.random.default_rng(seed)
+    if stream is True:
+        write_hyphy_data_stream(fn, sp_samples, N, rng,
+                                PoModatafile, PoModatafile_cons)
+    else:
+        write_hyphy_data(sp_data, sp_samples, N, rng,
+                         PoModatafile, PoModatafile_cons)
     PoModatafile.close()
     PoModatafile_cons.close()
 
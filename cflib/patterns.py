@@ -0,0 +1,186 @@
+#!/usr/bin/env python
+
+"""cflib.patterns
+===================
+
+This module provides functions to compress counts format files into
+their distinct site patterns.
+
+A site pattern is the array of the base counts of all populations at
+a site.  Many sites share the same pattern (e.g., monomorphic sites),
+so that downstream tools can work on the distinct patterns together
+with their weights (the number of sites with the pattern) instead of
+all sites.
+
+The counts file is read block by block.  The patterns of a block are
+reduced with NumPy first and then looked up in a dictionary that maps
+each pattern to its index, so that the memory needed only depends on
+the block size and the number of distinct patterns.
+
+A code example is::
+
+  import cflib.patterns as pt
+
+  pt.compress_cf("name-of-counts-file", "prefix-of-output",
+                 siteIndex=True)
+
+Objects
+-------
+Classes:
+  - :class:`PatternCounter`, collect the distinct site patterns
+
+Functions:
+  - :func:`compress_cf()`, compress a counts file into its site
+    patterns
+
+----
+
+"""
+
+__docformat__ = 'restructuredtext'
+
+import logging
+
+import numpy as np
+
+import cflib.seqbase as sb
+import cflib.cf as cf
+
+
+class PatternCounter():
+    """Collect the distinct site patterns and their weights.
+
+    The sites are added block by block with :func:`add_block()`.  The
+    patterns are numbered in the order of their first occurrence.
+
+    :param int nPop: Number of populations.
+
+    :ivar int nPop: Number of populations.
+    :ivar int nSites: Number of added sites.
+    :ivar dict patD: Dictionary with the index of each pattern (the
+      counts as bytes, in the order of the indices).
+    :ivar [str] chromL: Chromosome name of the first site of each
+      pattern.
+    :ivar [int] posL: Position of the first site of each pattern.
+    :ivar [int] weightL: Weight of each pattern.
+
+    """
+
+    def __init__(self, nPop):
+        self.nPop = nPop
+        self.nSites = 0
+        self.patD = {}
+        self.chromL = []
+        self.posL = []
+        self.weightL = []
+
+    def add_block(self, chromA, posA, countsA):
+        """Add a block of sites.
+
+        :param chromA: Chromosome names of the sites.
+        :param posA: Positions of the sites.
+        :param countsA: Counts of the sites (array of shape (n,
+          *self.nPop*, 4)).
+
+        :rtype: numpy.ndarray, the index of the pattern of each site.
+
+        """
+        rowA = np.ascontiguousarray(countsA, dtype=np.uint32).reshape(
+            len(countsA), 4 * self.nPop)
+        voidA = rowA.view(np.dtype((np.void, 4 * rowA.shape[1]))).reshape(-1)
+        (firstA, invA, nA) = np.unique(voidA, return_index=True,
+                                       return_inverse=True,
+                                       return_counts=True)[1:]
+        idxA = np.empty(len(firstA), dtype=np.int64)
+        for j in np.argsort(firstA).tolist():
+            (f, n) = (int(firstA[j]), int(nA[j]))
+            key = voidA[f].tobytes()
+            i = self.patD.get(key)
+            if i is None:
+                i = len(self.weightL)
+                self.patD[key] = i
+                self.chromL.append(str(chromA[f]))
+                self.posL.append(int(posA[f]))
+                self.weightL.append(0)
+            self.weightL[i] += n
+            idxA[j] = i
+        self.nSites += len(countsA)
+        return idxA[invA.reshape(-1)]
+
+    def get_counts(self):
+        """Get the counts of the patterns.
+
+        :rtype: numpy.ndarray of shape (nPatterns, *self.nPop*, 4)
+
+        """
+        return np.frombuffer(b''.join(self.patD), dtype=np.uint32).reshape(
+            -1, self.nPop, 4)
+
+    def get_weights(self):
+        """Get the weights of the patterns.
+
+        :rtype: numpy.ndarray
+
+        """
+        return np.array(self.weightL, dtype=np.int64)
+
+
+def compress_cf(countsFN, outPrefix, siteIndex=False, blockSize=100000,
+                compress=False):
+    """Compress a counts format file into its distinct site patterns.
+
+    The counts file is read in blocks of *blockSize* lines (cf.
+    :func:`iter_cf_blocks <cflib.cf.iter_cf_blocks>`) and the patterns
+    are collected with a :class:`PatternCounter`.  The following
+    files are written:
+
+    - *outPrefix*\\_patterns.cf, counts file with the first site of
+      each pattern;
+    - *outPrefix*\\_weights.txt, weight of each pattern (one per
+      line);
+    - *outPrefix*\\_index.txt, if *siteIndex* is True; chromosome,
+      position and pattern number (the line in the patterns file,
+      starting at 1) of each site.
+
+    :param str countsFN: Name of the counts file.
+    :param str outPrefix: Prefix of the output files.
+    :param Boolean siteIndex: Optional; also write the pattern of each
+      site.
+    :param int blockSize: Optional; number of lines read at once.
+    :param Boolean compress: Optional; gzip the patterns and index
+      files.
+
+    :rtype: (int nSites, int nPatterns)
+
+    """
+    ending = ".gz" if compress is True else ""
+    cfStr = cf.CFStream(countsFN)
+    nameL = cfStr.indivL
+    pc = PatternCounter(len(nameL))
+    if siteIndex is True:
+        idxFO = sb.gz_open(outPrefix + "_index.txt" + ending, mode='w')
+    for (chromA, posA, countsA) in cf.iter_cf_blocks(cfStr, blockSize,
+                                                     positions=True):
+        idxA = pc.add_block(chromA, posA, countsA)
+        if siteIndex is True:
+            idxFO.write(''.join("%s %d %d\n" % t for t in
+                                zip(chromA.tolist(), posA.tolist(),
+                                    (idxA + 1).tolist())))
+    cfStr.close()
+    if siteIndex is True:
+        idxFO.close()
+    nPat = len(pc.weightL)
+    logging.debug("Number of Sites: %s", pc.nSites)
+    logging.debug("Number of Patterns: %s", nPat)
+
+    lnFmt = "%s %d " + ' '.join(["%d,%d,%d,%d"] * pc.nPop)
+    with sb.gz_open(outPrefix + "_patterns.cf" + ending, mode='w') as fo:
+        fo.write("COUNTSFILE NPOP " + str(pc.nPop) + " NSITES " +
+                 str(nPat) + '\n')
+        fo.write("CHROM POS " + ' '.join(nameL) + '\n')
+        fo.write(''.join(lnFmt % (c, p, *cnt) + '\n' for (c, p, cnt) in
+                         zip(pc.chromL, pc.posL,
+                             pc.get_counts().reshape(nPat, -1).tolist())))
+    with open(outPrefix + "_weights.txt", 'w') as fo:
+        fo.write(''.join(str(w) + '\n' for w in pc.weightL))
+    return (pc.nSites, nPat)
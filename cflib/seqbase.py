@@ -11,6 +11,7 @@ Objects
 Classes:
   - :class:`Seq`, stores a single sequence
   - :class:`Region`, region in a genome
+  - :class:`RevCompView`, lazy reverse complement of sequence data
 
 Exception Classes:
   - :class:`SequenceDataError`
@@ -18,6 +19,9 @@ Exception Classes:
 
 Functions:
   - :func:`stripFName()`, strip filename off its ending
+  - :func:`encode_seq()`, encode sequence data as a NumPy array
+  - :func:`encode_seqs()`, encode aligned sequences as a NumPy matrix
+  - :func:`rev_comp()`, reverse complement sequence data
 
 ----
 
@@ -29,6 +33,19 @@ import os
 import gzip
 import sys
 
+import numpy as np
+
+# Complementary bases including IUPAC codes.  Gaps and unknown
+# characters are left unchanged.
+compBases = ('ACGTUMRWSYKVHDBN', 'TGCAAKYWSRMBDHVN')
+compTable = str.maketrans(compBases[0] + compBases[0].lower(),
+                          compBases[1] + compBases[1].lower())
+compArray = np.arange(256, dtype=np.uint8)
+compArray[np.frombuffer((compBases[0] + compBases[0].lower()).encode(),
+                        dtype=np.uint8)] = \
+    np.frombuffer((compBases[1] + compBases[1].lower()).encode(),
+                  dtype=np.uint8)
+
 
 class SequenceDataError(Exception):
     """General sequence data error exception."""
@@ -57,6 +74,8 @@ class Region():
     :ivar int end: 0-base end position.
     :ivar str name: Region name.
     """
+    __slots__ = ('chrom', 'start', 'end', 'name', 'orientation')
+
     def __init__(self, chrom, start, end, name=None, orientation="+"):
         self.chrom = chrom
         self.start = start - 1
@@ -73,6 +92,85 @@ class Region():
         print("0-based end position:", self.end)
 
 
+class RevCompView():
+    """Lazy reverse complement of sequence data.
+
+    The view behaves like the reverse complemented sequence string
+    but only complements the bases that are accessed.  Single bases
+    as well as slices can be accessed.  The whole reverse complement
+    is only created if the view is converted to a string, which also
+    happens when other string methods (e.g., *count* or *find*) are
+    called or when a string is appended (the result is a string).
+    Functions that need a real string (e.g., :mod:`re`) have to be
+    called with `str(view)`.
+
+    :param str seq: The original (forward) sequence data.
+
+    :ivar str seq: The original (forward) sequence data.
+
+    """
+    __slots__ = ('seq', 'len')
+
+    def __init__(self, seq):
+        self.seq = seq
+        self.len = len(seq)
+
+    def __len__(self):
+        return self.len
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            (start, stop, step) = key.indices(self.len)
+            if step != 1:
+                return str(self)[key]
+            if start >= stop:
+                return ''
+            return self.seq[self.len-stop:self.len-start][::-1].translate(
+                compTable)
+        if key < 0:
+            key += self.len
+        if key < 0 or key >= self.len:
+            raise IndexError("Position out of range.")
+        return self.seq[self.len-1-key].translate(compTable)
+
+    def __iter__(self):
+        for i in range(self.len):
+            yield self[i]
+
+    def __str__(self):
+        return rev_comp(self.seq)
+
+    def __eq__(self, other):
+        return str(self) == str(other)
+
+    def __hash__(self):
+        return hash(str(self))
+
+    def __add__(self, other):
+        return str(self) + other
+
+    def __radd__(self, other):
+        return other + str(self)
+
+    def __contains__(self, sub):
+        return sub in str(self)
+
+    def __getattr__(self, name):
+        # Delegate the remaining string methods to the reverse
+        # complement.
+        if name in RevCompView.__slots__:
+            raise AttributeError(name)
+        return getattr(str(self), name)
+
+    def lower(self):
+        """Return the lowered reverse complement as a string."""
+        return str(self).lower()
+
+    def upper(self):
+        """Return the uppered reverse complement as a string."""
+        return str(self).upper()
+
+
 class Seq:
     """A class that stores sequence data.
     .. _seqbase-seq:
@@ -80,12 +178,16 @@ class Seq:
     :ivar str name: Name of the sequence (e.g. species or individual
                     name).
     :ivar str descr: Description of the sequence.
-    :ivar str data: String with sequence data.
+    :ivar str data: String with sequence data (a :class:`RevCompView`,
+                    if the sequence has been reversed and
+                    complemented lazily).
     :ivar int dataLen: Number of saved bases.
     :ivar Boolean rc: True if *self.data* stores the
                       reverse-complement of the real sequence.
 
     """
+    __slots__ = ('name', 'descr', 'data', 'dataLen', 'rc', 'gene_is_rc')
+
     def __init__(self):
         self.name = None
         self.descr = ''
@@ -94,8 +196,6 @@ class Seq:
         self.rc = False
         self.gene_is_rc = False
 
-        self.__lowered = False
-
     def set_gene_is_rc_from_descr(self):
         if self.descr[-1] == "-":
             self.gene_is_rc = True
@@ -186,20 +286,28 @@ class Seq:
         """
         return self.rc
 
-    def rev_comp(self, change_sequence_only=False):
+    def rev_comp(self, change_sequence_only=False, lazy=False):
         """Reverses and complements the sequence.
 
-        This is rather slow for long sequences.
+        The complement is looked up in a translation table (cf.
+        :func:`rev_comp`) which honors IUPAC codes and the case of the
+        bases.
+
+        :param Boolean change_sequence_only: If true, do not toggle
+          *self.rc*.
+        :param Boolean lazy: If true, *self.data* is replaced by a
+          :class:`RevCompView` and bases are only complemented when
+          they are accessed.  This is faster if only a few positions
+          are read.
 
         """
-        compDict = {'a': 't', 'c': 'g', 'g': 'c', 't': 'a', 'n': 'n'}
-        self.data = self.data[::-1]
-        if self.__lowered is not True:
-            self.data = self.data.lower()
-        rcData = []
-        for i in range(self.dataLen):
-            rcData.append(compDict[self.data[i]])
-        self.data = ''.join(rcData)
+        if isinstance(self.data, RevCompView):
+            # Reverse complementing twice restores the original data.
+            self.data = self.data.seq
+        elif lazy is True:
+            self.data = RevCompView(self.data)
+        else:
+            self.data = rev_comp(self.data)
         # Fri Jan 15 17:39:23 CET 2016: Do not change description
         # because it is not necessary.
         # if self.descr[-1] == '+':
@@ -439,3 +547,68 @@ def gz_open(fn, mode='r'):
     else:
         fo = open(fn, mode=mode)
     return fo
+
+
+def encode_seq(data, lower=True):
+    """Encode the sequence string *data* as a NumPy array.
+
+    The bases are stored as ASCII codes (`numpy.uint8`).  By default,
+    the bases are lowered, so that e.g. 'A' and 'a' are encoded
+    equally.
+
+    :param str data: Sequence data.
+    :param Boolean lower: Optional; lower the bases before encoding.
+
+    :rtype: numpy.ndarray
+
+    """
+    if lower is True:
+        data = data.lower()
+    try:
+        return np.frombuffer(data.encode('ascii'), dtype=np.uint8)
+    except UnicodeEncodeError:
+        raise SequenceDataError("Sequence data is not valid.")
+
+
+def encode_seqs(seqL, lower=True):
+    """Encode the aligned sequences in *seqL* as a NumPy matrix.
+
+    Return a matrix of shape (len(*seqL*), L) where L is the length of
+    the alignment (cf. :func:`encode_seq`).
+
+    :param [Seq] seqL: List of :class:`Seq` objects of equal length.
+    :param Boolean lower: Optional; lower the bases before encoding.
+
+    :raises: :class:`SequenceDataError`, if the sequences do not have
+      equal length.
+
+    :rtype: numpy.ndarray
+
+    """
+    if len(seqL) == 0:
+        return np.empty((0, 0), dtype=np.uint8)
+    length = len(seqL[0].data)
+    for s in seqL:
+        if len(s.data) != length:
+            raise SequenceDataError("Sequences do not have equal length.")
+    data = encode_seq(''.join([str(s.data) for s in seqL]), lower)
+    return data.reshape(len(seqL), length)
+
+
+def rev_comp(data):
+    """Return the reverse complement of sequence *data*.
+
+    The complement is looked up in a precomputed table that honors
+    IUPAC codes and the case of the bases.  Gaps and unknown
+    characters are left unchanged.
+
+    :param data: Sequence data; either a string or an array encoded
+      with :func:`encode_seq`.
+    :type data: str | numpy.ndarray
+
+    :rtype: str | numpy.ndarray
+
+    """
+    if isinstance(data, np.ndarray):
+        return compArray[data[::-1]]
+    return data[::-1].translate(compTable)
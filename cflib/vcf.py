@@ -11,6 +11,8 @@ Classes:
   - :class:`NucBase`, store a nucleotide base
   - :class:`VCFStream`, a variant call format (VCF) stream object
   - :class:`VCFSeq`, a VCF file sequence object
+  - :class:`VCFColSeq`, a columnar VCF file sequence object
+  - :class:`AlleleArray`, an array of variable-length alleles
 
 Exception Classes:
   - :class:`NotAVariantCallFormatFileError`
@@ -24,7 +26,16 @@ Functions:
   - :func:`get_indiv_from_field_header()`, extract list of individuals
     from header
   - :func:`init_seq()`, open VCF file and initialize `VCFStream`
-  - :func:`open_seq()`, open VCF file and save it to a `VCFSeq`
+  - :func:`open_seq()`, open VCF file and save it to a `VCFSeq` or a
+    `VCFColSeq`
+  - :func:`get_gt_matrix()`, decode genotypes of VCF lines
+  - :func:`decode_gt()`, decode the genotype of a sample field
+  - :func:`get_format_indices()`, get positions of keys in a FORMAT
+    field
+  - :func:`split_lines()`, split VCF lines into fields
+  - :func:`get_columns()`, get positions, bases and genotypes of
+    split VCF lines
+  - :func:`concatenate_alleles()`, concatenate allele arrays
   - :func:`get_header_line_string()`, print vcf header line
 
 ----
@@ -33,6 +44,13 @@ Functions:
 
 __docformat__ = 'restructuredtext'
 
+import bisect
+import itertools
+import re
+import sys
+
+import numpy as np
+
 import cflib.seqbase as sb
 
 dna2ind = {'a': 0, 'c': 1, 'g': 2, 't': 3}
@@ -51,41 +69,41 @@ class NotANucBaseError(sb.SequenceDataError):
 hdList = ['#CHROM', 'POS', 'ID', 'REF', 'ALT',
           'QUAL', 'FILTER', 'INFO', 'FORMAT']
 
+# Matches everything but the genotype of a sample field.
+nonGTRe = re.compile(r':[^\t]*')
+
+# Largest allele index that fits into a genotype matrix
+# (cf. :func:`get_gt_matrix`).
+maxAlleleInd = np.iinfo(np.int8).max
+
 
 def update_base(ln, base, info=True):
     """Read line *ln* into base *base*.
 
     Split a given VCF file line and returns a :class:`NucBase`
-    object. If *info* is set to False, only #CHROM, REF, ALT and
-    speciesData will be read.
+    object.  Only #CHROM and POS are read immediately.  The other
+    fields are decoded when they are accessed for the first time
+    (cf. :class:`NucBase`), so that bases that are skipped because of
+    their position cost almost nothing.  If *info* is set to False,
+    only #CHROM, POS, REF, ALT, FORMAT and speciesData will be kept;
+    ID, QUAL, FILTER and INFO are discarded right away.
 
     """
-    lnList = ln.split('\t', maxsplit=9)
-    if len(lnList) >= 10:
-        base.chrom = lnList[0]
-        base.pos = int(lnList[1])
-        base.ref = lnList[3]
-        base.alt = lnList[4]
-        base.speciesData = lnList[9].rstrip().split('\t')
-        # base.speciesData = [s.split(':', maxsplit=1)[0]
-        #                    for s in lnList[9].rstrip().split('\t')]
-        if info is True:
-            base.id = lnList[2]
-            base.qual = lnList[5]
-            base.filter = lnList[6]
-            base.info = lnList[7]
-            base.format = lnList[8]
-    else:
+    if ln.count('\t') < 9:
         raise NotANucBaseError('Line ' + ln + ' is not a NucBase.')
+    (chrom, pos, rest) = ln.split('\t', maxsplit=2)
+    base.chrom = sys.intern(chrom)
+    base.pos = int(pos)
+    base.set_raw_fields(rest, info)
     return base
 
 
 def get_nuc_base_from_line(ln, info=False, ploidy=None):
     """Retrieve base data from a VCF file line *ln*.
 
-    Split a given VCF file line and returns a NucBase object. If
-    *info* is set to False, only #CHROM, POS, REF, ALT and speciesData will
-    be read.
+    Split a given VCF file line and returns a NucBase object
+    (cf. :func:`update_base`).  If *info* is set to False, only
+    #CHROM, POS, REF, ALT, FORMAT and speciesData will be kept.
 
     :param Bool info: Determines if info is retrieved from *ln*.
     :param int ploidy: If ploidy is known and given, it is set.
@@ -98,6 +116,229 @@ def get_nuc_base_from_line(ln, info=False, ploidy=None):
     return base
 
 
+def get_gt_matrix(sampleL, nSamples, ploidy):
+    """Decode the genotypes of VCF lines.
+
+    Return an `numpy.int8` matrix of shape (len(*sampleL*),
+    *nSamples*, *ploidy*) that contains the allele indices of the
+    genotypes (0 for the reference allele, 1 for the first
+    alternative allele and so on).  Missing calls as well as missing
+    chromosome sets (e.g., a haploid call of a diploid individual) are
+    set to -1.  Allele indices above 127 do not fit into the matrix.
+
+    The genotypes of all lines are decoded at once.  Only if the
+    lines contain genotypes with differing ploidy, they are decoded
+    one by one.
+
+    :param [str] sampleL: List with the sample columns of the VCF
+      lines, i.e., the tab separated sample fields (e.g.
+      '0/1:...\t1|1:...').
+    :param int nSamples: Number of samples.
+    :param int ploidy: Ploidy.
+
+    :raises: :class:`NotANucBaseError`, if an allele index is above
+      127.
+
+    :rtype: numpy.ndarray
+
+    """
+    n = len(sampleL)
+    gtM = np.full((n, nSamples, ploidy), -1, dtype=np.int8)
+    if n == 0 or nSamples == 0:
+        return gtM
+    gtL = [nonGTRe.sub('', smp.rstrip()).replace('|', '/').replace('.', '-1')
+           for smp in sampleL]
+    nAlleles = nSamples * ploidy
+    if all(g.count('/') + g.count('\t') == nAlleles - 1 and
+           g.count('\t') == nSamples - 1 for g in gtL):
+        allL = '/'.join(gtL).replace('\t', '/').split('/')
+        allA = np.array(allL).astype(np.int64)
+        if allA.max() > maxAlleleInd:
+            raise NotANucBaseError("Allele index " + str(allA.max()) +
+                                   " is too large.")
+        gtM[:] = allA.reshape(n, nSamples, ploidy)
+        return gtM
+    for i in range(n):
+        for (j, g) in enumerate(gtL[i].split('\t')[:nSamples]):
+            for (k, a) in enumerate(g.split('/')[:ploidy]):
+                try:
+                    a = int(a)
+                except ValueError:
+                    # Invalid base.
+                    continue
+                if a > maxAlleleInd:
+                    raise NotANucBaseError("Allele index " + str(a) +
+                                           " is too large.")
+                gtM[i, j, k] = a
+    return gtM
+
+
+def split_lines(lnL):
+    """Split the VCF file lines in *lnL* into their fields.
+
+    The sample fields are not split but kept in a single string (the
+    tenth field).  Empty lines are skipped.
+
+    :raises: :class:`NotANucBaseError`, if a line has less than ten
+      fields.
+
+    :rtype: [[str]]
+
+    """
+    fieldsL = []
+    for ln in lnL:
+        if ln.strip() == '':
+            continue
+        fields = ln.split('\t', maxsplit=9)
+        if len(fields) < 10:
+            raise NotANucBaseError('Line ' + ln + ' is not a NucBase.')
+        fieldsL.append(fields)
+    return fieldsL
+
+
+def get_columns(fieldsL, nSamples, ploidy):
+    """Get the positions, bases and genotypes of split VCF file lines.
+
+    :param [[str]] fieldsL: Split VCF file lines (cf. :func:`split_lines`).
+    :param int nSamples: Number of samples.
+    :param int ploidy: Ploidy.
+
+    :rtype: (numpy.ndarray posA, AlleleArray refA, AlleleArray altA,
+      numpy.ndarray gtM) with 1-based positions (`numpy.int64`),
+      reference and alternative bases (cf. :class:`AlleleArray`) and
+      the genotype matrix (cf. :func:`get_gt_matrix`)
+
+    """
+    posA = np.array([f[1] for f in fieldsL]).astype(np.int64)
+    refA = AlleleArray([f[3] for f in fieldsL])
+    altA = AlleleArray([f[4] for f in fieldsL])
+    gtM = get_gt_matrix([f[9] for f in fieldsL], nSamples, ploidy)
+    return (posA, refA, altA, gtM)
+
+
+
+class AlleleArray():
+    """Store variable-length alleles in a compact way.
+
+    The alleles are stored as concatenated byte strings together with
+    an array of offsets, so that a single long allele (e.g., of an
+    indel) does not widen the storage of all other alleles as in a
+    fixed-width NumPy byte string array.  Allele *i* is returned as a
+    byte string by *self[i]*.
+
+    :param [str] alleleL: Optional; list with alleles.
+
+    :ivar bytes data: Concatenated alleles.
+    :ivar offA: Array of length n+1 with the offsets of the alleles
+      in *data* (`numpy.int64`).
+
+    """
+    __slots__ = ('data', 'offA')
+
+    def __init__(self, alleleL=()):
+        encL = [a.encode() for a in alleleL]
+        self.data = b''.join(encL)
+        self.offA = np.zeros(len(encL) + 1, dtype=np.int64)
+        np.cumsum([len(a) for a in encL], out=self.offA[1:])
+
+    def __len__(self):
+        return len(self.offA) - 1
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("Allele index out of range.")
+        return self.data[self.offA[i]:self.offA[i+1]]
+
+    def tolist(self):
+        """Return the alleles as a list of byte strings."""
+        offL = self.offA.tolist()
+        return [self.data[offL[i]:offL[i+1]] for i in range(len(self))]
+
+
+def concatenate_alleles(alleleAL):
+    """Concatenate the :class:`AlleleArray` objects in *alleleAL*.
+
+    :rtype: AlleleArray
+
+    """
+    res = AlleleArray()
+    res.data = b''.join(a.data for a in alleleAL)
+    offAL = [res.offA]
+    start = 0
+    for a in alleleAL:
+        offAL.append(a.offA[1:] + start)
+        start += len(a.data)
+    res.offA = np.concatenate(offAL)
+    return res
+
+def fixed_field_property(name):
+    """Return a property for the fixed field *name* of a :class:`NucBase`.
+
+    The field is stored in the slot '_' + *name*; it is decoded on
+    first access (cf. :func:`NucBase.decode_fixed_fields`).
+
+    """
+    slot = '_' + name
+
+    def fget(self):
+        self.decode_fixed_fields()
+        return getattr(self, slot)
+
+    def fset(self, value):
+        self.decode_fixed_fields()
+        setattr(self, slot, value)
+
+    return property(fget, fset)
+
+
+def decode_gt(smp, ploidy=2):
+    """Decode the genotype of the sample field *smp*.
+
+    The genotype is the first colon separated entry of *smp*.  Alleles
+    that can not be read (e.g. '.') are set to None.
+
+    :param str smp: Sample field of a VCF line (e.g. '0/1:35:12').
+    :param int ploidy: Ploidy of the individual.
+
+    :rtype: [int]
+
+    """
+    gt = smp.split(':', 1)[0]
+    if ploidy == 1:
+        gtL = [gt]
+    elif '/' in gt:
+        gtL = gt.split('/')
+    elif '|' in gt:
+        gtL = gt.split('|')
+    else:
+        gtL = [gt]
+    for j in range(len(gtL)):
+        try:
+            gtL[j] = int(gtL[j])
+        except ValueError:
+            # Invalid Base.
+            gtL[j] = None
+    return gtL
+
+
+def get_format_indices(fmt, keyL):
+    """Get the positions of the keys *keyL* in the FORMAT field *fmt*.
+
+    >>> get_format_indices('GT:AD:DP:GQ', ['GQ', 'DP'])
+    (3, 2)
+
+    :param str fmt: FORMAT field of a VCF line.
+    :param [str] keyL: List of keys (e.g. ['GQ', 'DP']).
+
+    :rtype: tuple of int; None for keys that are not present.
+
+    """
+    fmtL = fmt.split(':')
+    return tuple(fmtL.index(k) if k in fmtL else None for k in keyL)
+
+
 class NucBase():
     """Stores a nucleotide base.
 
@@ -125,18 +366,107 @@ class NucBase():
                       :func:`set_ploidy`.
 
     """
+    __slots__ = ('chrom', 'pos', 'ploidy', '_id', '_ref', '_alt', '_qual',
+                 '_filter', '_info', '_format', '__rest', '__samples',
+                 '__speciesData')
+
     def __init__(self):
         self.chrom = ''
         self.pos = 0
-        self.id = ''
-        self.ref = ''
-        self.alt = ''
-        self.qual = ''
-        self.filter = ''
-        self.info = ''
-        self.format = ''
-        self.speciesData = []
         self.ploidy = None
+        self._id = ''
+        self._ref = ''
+        self._alt = ''
+        self._qual = ''
+        self._filter = ''
+        self._info = ''
+        self._format = ''
+        # Raw fields of the VCF line after POS; decoded on demand.
+        self.__rest = None
+        # Raw sample fields.
+        self.__samples = None
+        self.__speciesData = []
+
+    def set_raw_fields(self, rest, info=True):
+        """Set the raw fields of a VCF line that follow POS.
+
+        The fields are only decoded when they are accessed.  If *info*
+        is False, the fixed fields are split immediately and ID, QUAL,
+        FILTER and INFO are discarded, so that they do not stay in
+        memory; the sample fields are still decoded on demand.
+
+        :param str rest: Part of the VCF line after the POS field.
+        :param Boolean info: Optional; keep ID, QUAL, FILTER and INFO.
+
+        """
+        self.__rest = rest
+        self.__samples = None
+        self.__speciesData = None
+        if info is False:
+            self.decode_fixed_fields()
+            self._id = ''
+            self._qual = ''
+            self._filter = ''
+            self._info = ''
+
+    def decode_fixed_fields(self):
+        """Decode the fixed fields following POS.
+
+        The fields ID, REF, ALT, QUAL, FILTER, INFO and FORMAT are
+        decoded from the raw line if this has not been done yet.
+        Afterwards, the raw line is dropped.
+
+        """
+        if self.__rest is None:
+            return
+        (self._id, self._ref, self._alt, self._qual, self._filter,
+         self._info, fmt, self.__samples) = self.__rest.split('\t',
+                                                             maxsplit=7)
+        # The FORMAT field is usually the same for all lines.
+        self._format = sys.intern(fmt)
+        self.__rest = None
+
+    def get_fixed_fields(self):
+        """Return the list of the fixed fields following POS.
+
+        The list contains ID, REF, ALT, QUAL, FILTER, INFO and FORMAT
+        (cf. :func:`decode_fixed_fields`).
+
+        """
+        self.decode_fixed_fields()
+        return [self._id, self._ref, self._alt, self._qual, self._filter,
+                self._info, self._format]
+
+    def get_raw_samples(self):
+        """Return the raw, tab separated sample fields.
+
+        Return None if the sample fields have already been decoded or
+        set.
+
+        """
+        self.decode_fixed_fields()
+        return self.__samples
+
+    def __get_speciesData(self):
+        if self.__speciesData is None:
+            self.__speciesData = self.get_raw_samples().rstrip().split('\t')
+            # The raw sample fields are not needed anymore.
+            self.__samples = None
+        return self.__speciesData
+
+    def __set_speciesData(self, speciesData):
+        self.decode_fixed_fields()
+        self.__samples = None
+        self.__speciesData = speciesData
+
+    speciesData = property(__get_speciesData, __set_speciesData)
+    id = fixed_field_property('id')
+    ref = fixed_field_property('ref')
+    alt = fixed_field_property('alt')
+    qual = fixed_field_property('qual')
+    filter = fixed_field_property('filter')
+    info = fixed_field_property('info')
+    format = fixed_field_property('format')
 
     def get_info(self):
         """Return nucleotide base information string."""
@@ -187,7 +517,26 @@ class NucBase():
             self.ploidy = 1
         return self.ploidy
 
-    def get_speciesData(self):
+    def get_samples(self, indL):
+        """Return the sample fields of the individuals with indices *indL*.
+
+        Only the sample fields up to the largest index in *indL* are
+        tokenized.
+
+        :param [int] indL: List with 0-based indices of individuals.
+
+        :rtype: [str]
+
+        """
+        if len(indL) == 0:
+            return []
+        raw = self.get_raw_samples()
+        if raw is None:
+            return [self.speciesData[i] for i in indL]
+        smpL = raw.split('\t', maxsplit=max(indL)+1)
+        return [smpL[i].rstrip() for i in indL]
+
+    def get_speciesData(self, indL=None):
         """Return species data as a list.
 
         - data[0][0] = data of first species/individual on chromatide A
@@ -197,37 +546,21 @@ class NucBase():
         Sets data[i][j] to None if the base of individual *i* on
         chromosome *j* could not be read (e.g. it is not valid).
 
+        If *indL* is given, only the data of these individuals is
+        decoded and data[k] is the data of individual *indL[k]*
+        (cf. :func:`get_samples`).
+
+        :param [int] indL: Optional; list with 0-based indices of
+          individuals.
+
         :rtype: matrix of integers
 
         """
-        data = []
-        for i in range(0, len(self.speciesData)):
-            if self.ploidy == 1:
-                # Haploid.
-                baseInfo = self.speciesData[i].split(':')[0]
-                try:
-                    baseInfo = int(baseInfo)
-                except ValueError:
-                    # Invalid Base.
-                    baseInfo = None
-                data.append([baseInfo])
-            else:
-                # Diploid or even more
-                baseInfo = self.speciesData[i].split(':')[0]
-                if '/' in baseInfo:
-                    baseInfoL = baseInfo.split('/')
-                elif '|' in baseInfo:
-                    baseInfoL = baseInfo.split('|')
-                else:
-                    baseInfoL = baseInfo
-                for j in range(len(baseInfoL)):
-                    try:
-                        baseInfoL[j] = int(baseInfoL[j])
-                    except ValueError:
-                        # Invalid Base.
-                        baseInfoL[j] = None
-                data.append(baseInfoL)
-        return data
+        if indL is None:
+            smpL = self.speciesData
+        else:
+            smpL = self.get_samples(indL)
+        return [decode_gt(smp, self.ploidy) for smp in smpL]
 
     def get_base_ind(self, iI, iC):
         """Return the base of a specific individual.
@@ -308,6 +641,46 @@ class VCFStream():
             raise ValueError("End of VCFStream.")
             return None
 
+    def iter_blocks(self, n=10000):
+        """Iterate over the bases of the stream in blocks of *n* bases.
+
+        Yield a tuple (chromA, posA, refA, altA, gtM) for each block:
+        the chromosome names, the 1-based positions, the reference and
+        alternative bases and the genotype matrix of shape (n,
+        nSpecies, ploidy) of the bases in the block (cf.
+        :func:`get_columns`).  Missing calls are encoded as -1.
+
+        The first block starts with the stored base *self.base*.  The
+        stream is consumed; afterwards, *self.base* is the last base
+        of the stream.
+
+        :param int n: Optional; number of bases per block.
+
+        """
+        ploidy = self.base.ploidy
+        if ploidy is None:
+            ploidy = self.base.set_ploidy()
+        # Line of the stored base.
+        firstLn = '\t'.join([self.base.chrom, str(self.base.pos), '.',
+                             self.base.ref, self.base.alt, '.', '.', '.',
+                             '.', '\t'.join(self.base.speciesData)])
+        lines = itertools.chain([firstLn], self.fo)
+        lastLn = None
+        while True:
+            lnL = list(itertools.islice(lines, n))
+            if len(lnL) == 0:
+                break
+            fieldsL = split_lines(lnL)
+            if len(fieldsL) == 0:
+                continue
+            chromA = np.array([f[0] for f in fieldsL])
+            (posA, refA, altA, gtM) = get_columns(fieldsL, self.nSpecies,
+                                                  ploidy)
+            lastLn = lnL[-1]
+            yield (chromA, posA, refA, altA, gtM)
+        if lastLn is not None:
+            update_base(lastLn, self.base, info=False)
+
     def close(self):
         """Closes the linked file."""
         self.fo.close()
@@ -318,13 +691,21 @@ class VCFSeq():
 
     Initialized with :func:`open_seq`.
 
+    The bases are indexed by chromosome and position (cf.
+    :func:`build_index`), so that single bases can be looked up in
+    logarithmic time and regions can be fetched with
+    :func:`fetch`.
+
     :ivar str name: Sequence name.
     :ivar str header: Sequence header.
     :ivar [str] speciesL: List with species / individuals.
     :ivar int nSpecies: Number of species / individuals.
     :ivar [NucBase] baseL: List with stored :class:`NucBase` objects.
     :ivar int nBases: Number of :class:`NucBase` objects stored.
-
+    :ivar dict posD: Index of the bases; a dictionary with chromosome
+      names as keys and tuples of two lists as values: the sorted
+      positions of the bases on the chromosome and the respective
+      indices into *baseL*.  Set to None if the index is outdated.
 
 """
     def __init__(self):
@@ -335,6 +716,7 @@ class VCFSeq():
         self.nSpecies = 0
         self.baseL = []
         self.nBases = 0
+        self.posD = None
 
     def get_header_line_string(self, indiv):
         """Return a standard VCF File header string with individuals *indiv*.
@@ -373,8 +755,258 @@ class VCFSeq():
         """Append *base*, a given :class:`NucBase`, to the VCFSeq object."""
         self.baseL.append(base)
         self.nBases += 1
+        self.posD = None
+        return
+
+    def build_index(self):
+        """Index the stored bases by chromosome and position.
+
+        Fill *self.posD*.  The index is built automatically when it
+        is needed and has been invalidated by
+        :func:`append_nuc_base`.  If several bases share a position,
+        the first one is found by the lookup functions.
+
+        """
+        chromD = {}
+        for i in range(self.nBases):
+            b = self.baseL[i]
+            chromD.setdefault(b.chrom, []).append((b.pos, i))
+        self.posD = {}
+        for (chrom, pL) in chromD.items():
+            # The sort is stable, positions are usually sorted already.
+            pL.sort(key=lambda e: e[0])
+            self.posD[chrom] = ([e[0] for e in pL], [e[1] for e in pL])
         return
 
+    def __get_index(self, chrom, pos):
+        """Return the index into *self.baseL* of the base at *pos* on *chrom*.
+
+        Return None if no base is found.
+
+        """
+        if self.posD is None:
+            self.build_index()
+        try:
+            (posL, indL) = self.posD[chrom]
+        except KeyError:
+            return None
+        i = bisect.bisect_left(posL, pos)
+        if i < len(posL) and posL[i] == pos:
+            return indL[i]
+        return None
+
+    def has_base(self, chrom, pos):
+        """Return True (False) if base is (not) found.
+
+        :param str chrom: Chromosome name.
+        :param int pos: 1-based position on *chrom*.
+
+        """
+        return self.__get_index(chrom, pos) is not None
+
+    def get_nuc_base(self, chrom, pos):
+        """Return base at position *pos* of chromosome *chrom*."""
+        i = self.__get_index(chrom, pos)
+        if i is None:
+            raise sb.SequenceDataError('Base at position ' + str(pos) +
+                                       ' on chromosome ' + str(chrom) +
+                                       ' not found.')
+        return self.baseL[i]
+
+    def fetch(self, rg):
+        """Return the bases within region *rg*.
+
+        :param Region rg: :class:`Region <cflib.seqbase.Region>`; the
+          start and end positions are included.
+
+        :rtype: [NucBase] sorted by position
+
+        """
+        if self.posD is None:
+            self.build_index()
+        try:
+            (posL, indL) = self.posD[rg.chrom]
+        except KeyError:
+            return []
+        # Positions in the VCF file are 1-based, *rg* is 0-based.
+        i = bisect.bisect_left(posL, rg.start + 1)
+        j = bisect.bisect_right(posL, rg.end + 1)
+        return [self.baseL[k] for k in indL[i:j]]
+
+    def iter_region(self, rg):
+        """Iterate over all positions of region *rg*.
+
+        Yield a tuple for each 1-based position within *rg*.  The
+        second element is the :class:`NucBase` at that position or
+        None, if there is no base.
+
+        :param Region rg: :class:`Region <cflib.seqbase.Region>`; the
+          start and end positions are included.
+
+        :rtype: (int, NucBase)
+
+        """
+        baseL = self.fetch(rg)
+        i = 0
+        for pos in range(rg.start + 1, rg.end + 2):
+            if i < len(baseL) and baseL[i].pos == pos:
+                yield (pos, baseL[i])
+                # Skip further bases at the same position.
+                while i < len(baseL) and baseL[i].pos == pos:
+                    i += 1
+            else:
+                yield (pos, None)
+
+
+class VCFColSeq():
+    """Store data retrieved from a VCF file in columns.
+
+    Initialized with :func:`open_seq` (*columnar* = True).  In
+    contrast to :class:`VCFSeq`, the data is not stored in a list of
+    :class:`NucBase` objects but in NumPy arrays which need far less
+    memory.  :class:`NucBase` objects are created on demand
+    (cf. :func:`get_base_by_index`).
+
+    :ivar str name: Sequence name.
+    :ivar str header: Sequence header.
+    :ivar [str] speciesL: List with species / individuals.
+    :ivar int nSpecies: Number of species / individuals.
+    :ivar int nBases: Number of stored bases.
+    :ivar int ploidy: Ploidy of the individuals.
+    :ivar [str] chromL: List with chromosome names; the chromosomes of
+      the bases are stored as indices into this list.
+    :ivar chromA: Array with chromosome indices (`numpy.int32`).
+    :ivar posA: Array with 1-based positions (`numpy.int64`).
+    :ivar refA: :class:`AlleleArray` with reference bases.
+    :ivar altA: :class:`AlleleArray` with alternative bases.
+    :ivar gtM: Genotype matrix of shape (nBases, nSpecies, ploidy)
+      (`numpy.int8`, cf. :func:`get_gt_matrix`).
+    :ivar dict infoD: Dictionary with lists of the ID, QUAL, FILTER,
+      INFO and FORMAT fields; only filled if requested
+      (cf. :func:`open_seq`).
+
+    """
+    def __init__(self):
+        """Initialize a :class:`VCFColSeq` object; add state objects."""
+        self.name = ''
+        self.header = ''
+        self.speciesL = []
+        self.nSpecies = 0
+        self.nBases = 0
+        self.ploidy = None
+        self.chromL = []
+        self.chromA = np.empty(0, dtype=np.int32)
+        self.posA = np.empty(0, dtype=np.int64)
+        self.refA = AlleleArray()
+        self.altA = AlleleArray()
+        self.gtM = np.empty((0, 0, 0), dtype=np.int8)
+        self.infoD = None
+
+        self.__chromD = {}
+        self.__posD = None
+
+    def append_lines(self, lines, info=False, blockSize=100000):
+        """Append the bases of the VCF file lines in *lines*.
+
+        The lines are parsed in blocks of *blockSize* lines and the
+        arrays are only concatenated once at the end.
+
+        :param lines: Iterable of VCF file lines (e.g., a file object).
+        :param Boolean info: Optional; also store the ID, QUAL, FILTER,
+          INFO and FORMAT fields.
+        :param int blockSize: Optional; number of lines that are
+          parsed at once.
+
+        """
+        chromAL = [self.chromA]
+        posAL = [self.posA]
+        refAL = [self.refA]
+        altAL = [self.altA]
+        gtML = [self.gtM] if self.nBases > 0 else []
+        lines = iter(lines)
+        while True:
+            lnL = list(itertools.islice(lines, blockSize))
+            if len(lnL) == 0:
+                break
+            fieldsL = split_lines(lnL)
+            if len(fieldsL) == 0:
+                continue
+            if self.ploidy is None:
+                base = NucBase()
+                base.speciesData = [fieldsL[0][9].split('\t')[0]]
+                self.ploidy = base.set_ploidy()
+            chromL = []
+            for f in fieldsL:
+                try:
+                    chromL.append(self.__chromD[f[0]])
+                except KeyError:
+                    self.__chromD[f[0]] = len(self.chromL)
+                    self.chromL.append(f[0])
+                    chromL.append(self.__chromD[f[0]])
+            chromAL.append(np.array(chromL, dtype=np.int32))
+            (posA, refA, altA, gtM) = get_columns(fieldsL, self.nSpecies,
+                                                  self.ploidy)
+            posAL.append(posA)
+            refAL.append(refA)
+            altAL.append(altA)
+            gtML.append(gtM)
+            if info is True:
+                if self.infoD is None:
+                    self.infoD = {'id': [], 'qual': [], 'filter': [],
+                                  'info': [], 'format': []}
+                for (k, i) in [('id', 2), ('qual', 5), ('filter', 6),
+                               ('info', 7), ('format', 8)]:
+                    self.infoD[k].extend([f[i] for f in fieldsL])
+            self.nBases += len(fieldsL)
+        if len(gtML) == 0:
+            return
+        self.chromA = np.concatenate(chromAL)
+        self.posA = np.concatenate(posAL)
+        self.refA = concatenate_alleles(refAL)
+        self.altA = concatenate_alleles(altAL)
+        self.gtM = np.concatenate(gtML)
+        self.__posD = None
+
+    def get_base_by_index(self, i):
+        """Return the base with index *i* as a :class:`NucBase`.
+
+        The :class:`NucBase` is created on demand.
+
+        """
+        base = NucBase()
+        base.chrom = self.chromL[self.chromA[i]]
+        base.pos = int(self.posA[i])
+        base.ref = self.refA[i].decode()
+        base.alt = self.altA[i].decode()
+        base.speciesData = ['/'.join(['.' if a < 0 else str(a) for a in g])
+                            for g in self.gtM[i].tolist()]
+        base.ploidy = self.ploidy
+        if self.infoD is not None:
+            base.id = self.infoD['id'][i]
+            base.qual = self.infoD['qual'][i]
+            base.filter = self.infoD['filter'][i]
+            base.info = self.infoD['info'][i]
+        # Only the genotypes are stored.
+        base.format = 'GT'
+        return base
+
+    def __get_index(self, chrom, pos):
+        """Return the index of the base at *pos* on *chrom* or None."""
+        if self.__posD is None:
+            self.__posD = {}
+            for (c, name) in enumerate(self.chromL):
+                indA = np.flatnonzero(self.chromA == c)
+                indA = indA[np.argsort(self.posA[indA], kind='stable')]
+                self.__posD[name] = (self.posA[indA], indA)
+        try:
+            (posA, indA) = self.__posD[chrom]
+        except KeyError:
+            return None
+        i = np.searchsorted(posA, pos)
+        if i < len(posA) and posA[i] == pos:
+            return int(indA[i])
+        return None
+
     def has_base(self, chrom, pos):
         """Return True (False) if base is (not) found.
 
@@ -382,21 +1014,16 @@ class VCFSeq():
         :param int pos: 1-based position on *chrom*.
 
         """
-        for i in range(0, self.nBases):
-            if pos == self.baseL[i].pos \
-               and chrom == self.baseL[i].chrom:
-                return True
-        return False
+        return self.__get_index(chrom, pos) is not None
 
     def get_nuc_base(self, chrom, pos):
         """Return base at position *pos* of chromosome *chrom*."""
-        for i in range(0, self.nBases):
-            if pos == self.baseL[i].pos \
-               and chrom == self.baseL[i].chrom:
-                return self.baseL[i]
-        raise sb.SequenceDataError('Base at position ' + str(pos) +
-                                   ' on chromosome ' + str(chrom) +
-                                   ' not found.')
+        i = self.__get_index(chrom, pos)
+        if i is None:
+            raise sb.SequenceDataError('Base at position ' + str(pos) +
+                                       ' on chromosome ' + str(chrom) +
+                                       ' not found.')
+        return self.get_base_by_index(i)
 
 
 def check_fixed_field_header(ln):
@@ -474,18 +1101,30 @@ def init_seq(VCFFileName, maxskip=100, name=None):
     return VCFStream(name, VCFFile, speciesL, base)
 
 
-def open_seq(VCFFileName, maxskip=100, name=None):
+def open_seq(VCFFileName, maxskip=100, name=None, columnar=False,
+             info=False, blockSize=100000):
     """Open a VCF4.1 file.
 
     Try to open the given VCF file, checks if it is in VCF format and
     reads the bases(s).  It returns an :class:`VCFSeq` object that
     contains all the information.
 
+    If *columnar* is True, a :class:`VCFColSeq` object is returned
+    instead.  It stores the data in NumPy arrays and needs much less
+    memory.  The VCF file is then read in blocks of *blockSize* lines.
+    The ID, QUAL, FILTER, INFO and FORMAT fields are only stored if
+    *info* is True.
+
     :param str VCFFileName: Name of the VCF file.
     :param int maxskip: Only look *maxskip* lines for the start of the
                         bases (defaults to 80).
     :param str name: Set the name of the sequence to *name*, otherwise
                      set it to the filename.
+    :param Boolean columnar: Optional; store the data in columns.
+    :param Boolean info: Optional; store the ID, QUAL, FILTER, INFO and
+                         FORMAT fields in columnar mode.
+    :param int blockSize: Optional; number of lines that are read at
+                          once in columnar mode.
 
     """
     def test_sequence(seq):
@@ -500,7 +1139,10 @@ def open_seq(VCFFileName, maxskip=100, name=None):
         """
         pass
 
-    seq = VCFSeq()
+    if columnar is True:
+        seq = VCFColSeq()
+    else:
+        seq = VCFSeq()
     seq.header = ""
 
     flag = False
@@ -527,11 +1169,16 @@ def open_seq(VCFFileName, maxskip=100, name=None):
     if flag is False:
         raise NotAVariantCallFormatFileError(
             "Didn't find any data within " + str(maxskip) + " lines.")
-    for line in VCFFile:
-        base = get_nuc_base_from_line(line)
-        seq.append_nuc_base(base)
+    if columnar is True:
+        seq.append_lines(VCFFile, info, blockSize)
+    else:
+        for line in VCFFile:
+            base = get_nuc_base_from_line(line)
+            seq.append_nuc_base(base)
 
     VCFFile.close()
+    if columnar is False:
+        seq.build_index()
     test_sequence(seq)
     return seq
 
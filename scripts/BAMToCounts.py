@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+
+"""Convert BAM or CRAM files to counts format.
+
+The bases of the aligned reads are counted for each population and
+written to a counts format file.
+
+"""
+
+import argparse
+import logging
+import cflib.bam as bam
+import cflib.seqbase as sb
+
+descr = """Convert BAM or CRAM files to counts format.
+
+The bases of the aligned reads are counted for each population and
+written to a counts format file.  No variant calling is involved, so
+that the counts of all alleles are kept.
+
+Each population is given with `--pop NAME BAMFILE [BAMFILE ...]`; the
+reads of all BAM files of a population are summed up.  Bases below
+the base quality threshold and reads below the mapping quality
+threshold are ignored, as well as unmapped, secondary, QC failed and
+duplicate reads.
+
+Regions are given in the form CHROM:START-END (1-based, inclusive) or
+CHROM.  By default, all chromosomes in the header of the first BAM
+file are converted.  The regions are split into chunks that are
+counted in parallel.
+
+Index files need to be provided for all BAM files.  They can be
+created from the terminal with $(samtools index "bam-file.bam").  The
+output file can additionally be gzipped (indicated by a .gz file
+ending).
+
+"""
+
+parser = argparse.ArgumentParser(
+    formatter_class=argparse.RawDescriptionHelpFormatter,
+    description=descr)
+
+parser.add_argument("output",
+                    help="name of (gzipped) outputfile in counts format")
+parser.add_argument("--pop", nargs='+', action="append", required=True,
+                    metavar=("NAME", "BAMFILE"),
+                    help="name and BAM files of a population")
+parser.add_argument("-r", "--region", action="append",
+                    help="region to convert (CHROM:START-END or CHROM)")
+parser.add_argument("-q", "--min-bq", type=int, default=13,
+                    help="minimum base quality (default: 13)")
+parser.add_argument("-Q", "--min-mq", type=int, default=0,
+                    help="minimum mapping quality (default: 0)")
+parser.add_argument("--reference",
+                    help="reference fasta file (needed for CRAM files)")
+parser.add_argument("-p", "--processes", type=int, default=1,
+                    help="number of processes (default: 1)")
+parser.add_argument("--chunk-size", type=int, default=1000000,
+                    help="length of the chunks (default: 1000000)")
+parser.add_argument("--skip-empty", action="store_true",
+                    help="do not write positions without counts")
+parser.add_argument("-v", "--verbose", action="count",
+                    help="turn on verbosity (-v or -vv)")
+args = parser.parse_args()
+
+logging.basicConfig(format='%(levelname)s: %(message)s')
+logger = logging.getLogger()
+if args.verbose == 0:
+    logger.setLevel(logging.WARN)
+elif args.verbose == 1:
+    logger.setLevel(logging.INFO)
+elif args.verbose == 2:
+    logger.setLevel(logging.DEBUG)
+
+for pop in args.pop:
+    if len(pop) < 2:
+        parser.error("--pop needs a name and at least one BAM file")
+nameL = [pop[0] for pop in args.pop]
+bamFnM = [pop[1:] for pop in args.pop]
+
+if args.region is None:
+    rgL = None
+else:
+    rgL = []
+    allRgL = bam.get_regions(bamFnM[0][0], args.reference)
+    for rgStr in args.region:
+        if ':' in rgStr:
+            (chrom, posStr) = rgStr.rsplit(':', maxsplit=1)
+            (start, end) = posStr.replace(',', '').split('-')
+            rgL.append(sb.Region(chrom, int(start), int(end)))
+        else:
+            rgL.extend(rg for rg in allRgL if rg.chrom == rgStr)
+
+bam.bam_to_cf(bamFnM, args.output, rgL=rgL, nameL=nameL,
+              minBQ=args.min_bq, minMQ=args.min_mq, refFN=args.reference,
+              nProc=args.processes, chunkSize=args.chunk_size,
+              skipEmpty=args.skip_empty)
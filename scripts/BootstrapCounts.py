@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+
+"""Create bootstrap replicates of a counts file.
+
+The sites of the counts file are drawn with replacement and the
+replicates are written to counts format files.
+
+"""
+
+import argparse
+import logging
+import cflib.bootstrap as bs
+
+descr = """Create bootstrap replicates of a counts file.
+
+The sites of the counts file are drawn with replacement.  Replicate i
+is written to PREFIX_i.cf.  Each replicate uses its own random number
+generator that is derived from `--seed` so that the replicates are
+reproducible, independent of the number of processes.
+
+With `--window-size`, windows of the given length on the chromosomes
+are drawn instead of single sites (block bootstrap).
+
+With `--weights-only`, the full replicates are not written.  Instead,
+the distinct site patterns are written to PREFIX_patterns.cf and the
+weights of the patterns to PREFIX_weights.txt, one line per replicate.
+
+The input file can be gzipped (indicated by a .gz file ending).  The
+output files are gzipped with `--gzip`.
+
+"""
+
+parser = argparse.ArgumentParser(
+    formatter_class=argparse.RawDescriptionHelpFormatter,
+    description=descr)
+
+parser.add_argument("countsFile",
+                    help="path to (gzipped) counts file")
+parser.add_argument("prefix",
+                    help="prefix of the output files")
+parser.add_argument("-n", "--replicates", type=int, default=100,
+                    help="number of replicates (default: 100)")
+parser.add_argument("-s", "--seed", type=int,
+                    help="seed of the random number generators")
+parser.add_argument("-w", "--window-size", type=int,
+                    help="draw windows of this length (block bootstrap)")
+parser.add_argument("--weights-only", action="store_true",
+                    help="only write the site patterns and their weights")
+parser.add_argument("-p", "--processes", type=int, default=1,
+                    help="number of processes (default: 1)")
+parser.add_argument("-z", "--gzip", action="store_true",
+                    help="gzip the output counts files")
+parser.add_argument("-v", "--verbose", action="count",
+                    help="turn on verbosity (-v or -vv)")
+args = parser.parse_args()
+
+logging.basicConfig(format='%(levelname)s: %(message)s')
+logger = logging.getLogger()
+if args.verbose == 0:
+    logger.setLevel(logging.WARN)
+elif args.verbose == 1:
+    logger.setLevel(logging.INFO)
+elif args.verbose == 2:
+    logger.setLevel(logging.DEBUG)
+
+bs.bootstrap_cf(args.countsFile, args.prefix, nRep=args.replicates,
+                seed=args.seed, windowSize=args.window_size,
+                weightsOnly=args.weights_only, nProc=args.processes,
+                compress=args.gzip)
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+
+"""Compress a counts file into its distinct site patterns.
+
+The distinct site patterns of the counts file are written together
+with their weights.
+
+"""
+
+import argparse
+import logging
+import cflib.patterns as pt
+
+descr = """Compress a counts file into its distinct site patterns.
+
+A site pattern is the set of base counts of all populations at a site.
+The distinct patterns are written to PREFIX_patterns.cf (with the
+chromosome and position of the first site of each pattern) and the
+number of sites of each pattern to PREFIX_weights.txt.  With
+`--site-index`, the pattern number (line in the patterns file,
+starting at 1) of each site is written to PREFIX_index.txt.
+
+The counts file is read block by block, so that the memory needed
+depends on the number of distinct patterns but not on the number of
+sites.
+
+The input file can be gzipped (indicated by a .gz file ending).  The
+patterns and index files are gzipped with `--gzip`.
+
+"""
+
+parser = argparse.ArgumentParser(
+    formatter_class=argparse.RawDescriptionHelpFormatter,
+    description=descr)
+
+parser.add_argument("countsFile",
+                    help="path to (gzipped) counts file")
+parser.add_argument("prefix",
+                    help="prefix of the output files")
+parser.add_argument("-i", "--site-index", action="store_true",
+                    help="write the pattern number of each site")
+parser.add_argument("-z", "--gzip", action="store_true",
+                    help="gzip the patterns and index files")
+parser.add_argument("-v", "--verbose", action="count",
+                    help="turn on verbosity (-v or -vv)")
+args = parser.parse_args()
+
+logging.basicConfig(format='%(levelname)s: %(message)s')
+logger = logging.getLogger()
+if args.verbose == 0:
+    logger.setLevel(logging.WARN)
+elif args.verbose == 1:
+    logger.setLevel(logging.INFO)
+elif args.verbose == 2:
+    logger.setLevel(logging.DEBUG)
+
+(nSites, nPat) = pt.compress_cf(args.countsFile, args.prefix,
+                                siteIndex=args.site_index,
+                                compress=args.gzip)
+logging.info("%s sites compressed into %s patterns.", nSites, nPat)
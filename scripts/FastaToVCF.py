@@ -7,6 +7,10 @@ a file in VCF. A reference genome can be provided in fasta format as
 input. If no reference is given, the first sequence in the fasta file
 will be used as reference.
 
+With `--bgzip`, the VCF file is compressed with bgzip and indexed with
+tabix, so that it can directly be used to create counts files.  The
+name of the output file has to end with .gz in this case.
+
 """
 
 import argparse
@@ -24,7 +28,12 @@ parser.add_argument("output",
                     help="name of VCF output file")
 parser.add_argument("-r", "--reference",
                     help="path to reference genome in fasta format")
+parser.add_argument("-z", "--bgzip", action="store_true",
+                    help="compress output with bgzip and index it with "
+                    "tabix; the output name has to end with .gz")
 args = parser.parse_args()
+if args.bgzip and not args.output.endswith('.gz'):
+    parser.error("the output name has to end with .gz with --bgzip")
 
 faSeq = fa.open_seq(args.fastafile)
 if args.reference is not None:
@@ -32,4 +41,4 @@ if args.reference is not None:
     refSeq = faRef.get_seq_by_id(0)
 else:
     refSeq = faSeq.get_seq_by_id(0)
-fa.save_as_vcf(faSeq, refSeq, args.output)
+fa.save_as_vcf(faSeq, refSeq, args.output, bgzip=args.bgzip)
@@ -77,7 +77,31 @@ parser.add_argument("-p", "--ploidy", nargs=1,
                     help="ploidy of the sample")
 parser.add_argument("-v", "--verbosity", action="count",
                     help="turn on verbosity")
+parser.add_argument("--min-gq", type=int,
+                    help="treat calls with genotype quality below MIN_GQ "
+                    "as missing")
+parser.add_argument("--min-dp", type=int,
+                    help="treat calls with read depth below MIN_DP as missing")
+parser.add_argument("--max-dp", type=int,
+                    help="treat calls with read depth above MAX_DP as missing")
+parser.add_argument("--only-variable", action="store_true",
+                    help="only write positions with VCF records; counts of "
+                    "monomorphic sites are written to OUTPUT.inv")
+parser.add_argument("--allele-depth", action="store_true",
+                    help="count allele depths (AD) instead of genotypes "
+                    "(pool-seq data)")
+parser.add_argument("--downsample", type=int,
+                    help="with --allele-depth, downsample populations to "
+                    "DOWNSAMPLE reads")
+parser.add_argument("--seed", type=int,
+                    help="seed of the random number generator used by "
+                    "--downsample")
 args = parser.parse_args()
+if not args.allele_depth:
+    if args.downsample is not None:
+        parser.error("--downsample requires --allele-depth")
+    if args.seed is not None:
+        parser.error("--seed requires --allele-depth")
 
 fastaRef = args.reference
 vcfFnL = args.VCFFiles
@@ -103,6 +127,13 @@ else:
 if ploidy is not None:
     cfw.set_ploidy(int(ploidy))
 
+cfw.set_genotype_filter(minGQ=args.min_gq, minDP=args.min_dp,
+                        maxDP=args.max_dp)
+if args.only_variable:
+    cfw.set_only_variable()
+if args.allele_depth:
+    cfw.set_allele_depth_mode(depth=args.downsample, seed=args.seed)
+
 faR = fa.init_seq(fastaRef)
 if offset is None:
     rg = faR.seq.get_region_no_description()
@@ -34,6 +34,11 @@ In order to correctly match the SNPs to the reference, the chromosome
 names given in the multiple alignment reference (cf. CCDS alignments
 from UCSC) have to match the chromosome names of the VCF file.
 
+The reference is read chromosome by chromosome through a fasta index
+(.fai), which is created if it does not exist.  A gzipped reference
+needs to be compressed with bgzip to be indexed; otherwise, it is read
+completely.
+
 The input as well as the output files can additionally be gzipped
 (indicated by a .gz file ending).
 
@@ -56,6 +61,9 @@ parser.add_argument("-v", "--verbose", action="count",
                     help="turn on verbosity (-v or -vv)")
 parser.add_argument("-i", "--one-indiv", action="store_true",
                     help="randomly choose one indivual per population")
+parser.add_argument("--ref-memory", type=int, default=512,
+                    help="maximum size of the reference chromosomes kept "
+                    "in memory in MB (default: 512)")
 args = parser.parse_args()
 
 gp_fn = args.gpfile
@@ -79,7 +87,7 @@ cfw = cf.CFWriter(vcfFnL, output, oneIndividual=oneI)
 if args.synonymous is True:
     cfw.onlySynonymous = True
 
-gp_stream = gp.GPStream(gp_fn, rf_fn)
+gp_stream = gp.GPStream(gp_fn, rf_fn, maxMem=args.ref_memory * 2**20)
 
 cfw.write_HLn()
 cf.write_cf_from_gp_stream(gp_stream, cfw)
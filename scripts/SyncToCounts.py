@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+
+"""Convert PoPoolation2 sync files to counts format.
+
+The allele counts of the populations in the sync file are reordered
+and written to a counts format file.
+
+"""
+
+import argparse
+import logging
+import cflib.cf as cf  # noqa
+
+descr = """Convert PoPoolation2 sync files to counts format.
+
+The allele counts of the populations in the sync file (given in the
+form A:T:C:G:N:del) are reordered to A,C,G,T and written to a counts
+format file.  N and deletion counts are dropped.
+
+The population names can be given with `--names`; they default to
+pop1, pop2, ...
+
+The input as well as the output files can additionally be gzipped
+(indicated by a .gz file ending).  With `--bgzip`, the output is
+compressed with BGZF (block gzip).
+
+"""
+
+parser = argparse.ArgumentParser(
+    formatter_class=argparse.RawDescriptionHelpFormatter,
+    description=descr)
+
+parser.add_argument("syncFile",
+                    help="path to (gzipped) sync file")
+parser.add_argument("output",
+                    help="name of (gzipped) outputfile in counts format")
+parser.add_argument("-n", "--names", nargs='+',
+                    help="names of the populations")
+parser.add_argument("-z", "--bgzip", action="store_true",
+                    help="compress the output with bgzip")
+parser.add_argument("-v", "--verbose", action="count",
+                    help="turn on verbosity (-v or -vv)")
+args = parser.parse_args()
+
+logging.basicConfig(format='%(levelname)s: %(message)s')
+logger = logging.getLogger()
+if args.verbose == 0:
+    logger.setLevel(logging.WARN)
+elif args.verbose == 1:
+    logger.setLevel(logging.INFO)
+elif args.verbose == 2:
+    logger.setLevel(logging.DEBUG)
+
+cf.sync_to_cf(args.syncFile, args.output, nameL=args.names,
+              bgzip=args.bgzip)
@@ -16,7 +16,14 @@ setuptools.setup(
     long_description_content_type="text/markdown",
     install_requires=["scipy", "numpy", "pysam"],
     classifiers=['Intended Audience :: Science/Research'],
-    scripts=["scripts/CountsToFasta.py", "scripts/FastaToCounts.py",
-             "scripts/FastaToVCF.py", "scripts/FastaVCFToCounts.py",
-             "scripts/FilterMSA.py", "scripts/GPToCounts.py",
-             "scripts/MSAToCounts.py"])
+    scripts=["scripts/BAMToCounts.py",
+             "scripts/BootstrapCounts.py",
+             "scripts/CompressCounts.py",
+             "scripts/CountsToFasta.py",
+             "scripts/FastaToCounts.py",
+             "scripts/FastaToVCF.py",
+             "scripts/FastaVCFToCounts.py",
+             "scripts/FilterMSA.py",
+             "scripts/GPToCounts.py",
+             "scripts/MSAToCounts.py",
+             "scripts/SyncToCounts.py"])
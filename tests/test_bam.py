@@ -0,0 +1,134 @@
+"""Tests for :mod:`cflib.bam`."""
+
+import multiprocessing
+import os
+
+import numpy as np
+import pysam as ps
+import pytest
+
+import cflib.bam as bam
+import cflib.cf as cf
+import cflib.seqbase as sb
+
+header = {'HD': {'VN': '1.0', 'SO': 'coordinate'},
+          'SQ': [{'SN': 'chr1', 'LN': 30}, {'SN': 'chr2', 'LN': 10}]}
+
+# Reads of the BAM files of the two populations; (chrom, 0-based
+# start, bases, base qualities, mapping quality, flag).
+readsM = [[('chr1', 0, 'ACGTACGTAC', [30] * 10, 60, 0),
+           ('chr1', 0, 'GGGGGGGGGG', [30] * 10, 60, 0x400),
+           ('chr1', 5, 'CCCCCCCCCC', [30] * 5 + [5] * 5, 60, 0),
+           ('chr1', 8, 'TTTTT', [30] * 5, 10, 0)],
+          [('chr1', 2, 'AAAA', [30] * 4, 60, 0),
+           ('chr2', 0, 'ACGT', [30] * 4, 60, 0x100),
+           ('chr2', 3, 'TGCA', [30] * 4, 60, 0)]]
+
+
+def write_bam(fn, readL):
+    with ps.AlignmentFile(fn, 'wb', header=header) as af:
+        for (i, (chrom, start, seq, qualL, mq, flag)) in enumerate(readL):
+            read = ps.AlignedSegment()
+            read.query_name = 'r' + str(i)
+            read.query_sequence = seq
+            read.flag = flag
+            read.reference_id = af.get_tid(chrom)
+            read.reference_start = start
+            read.mapping_quality = mq
+            read.cigartuples = [(0, len(seq))]
+            read.query_qualities = qualL
+            af.write(read)
+    ps.index(fn)
+
+
+def get_expected_counts(chrom, minBQ, minMQ):
+    """Count the bases of *readsM* on *chrom* position by position."""
+    cA = np.zeros((header['SQ'][0 if chrom == 'chr1' else 1]['LN'],
+                   len(readsM), 4), dtype=np.int64)
+    for (p, readL) in enumerate(readsM):
+        for (c, start, seq, qualL, mq, flag) in readL:
+            if c != chrom or flag != 0 or mq < minMQ:
+                continue
+            for (i, (b, q)) in enumerate(zip(seq, qualL)):
+                if q >= minBQ:
+                    cA[start + i, p, 'ACGT'.index(b)] += 1
+    return cA
+
+
+@pytest.fixture
+def bamFnM(tmp_path):
+    fnM = []
+    for (p, readL) in enumerate(readsM):
+        fn = str(tmp_path / ('pop' + str(p) + '.bam'))
+        write_bam(fn, readL)
+        fnM.append([fn])
+    return fnM
+
+
+def test_split_regions():
+    chunkL = bam.split_regions([sb.Region('chr1', 1, 25),
+                                sb.Region('chr2', 3, 4)], 10)
+    assert [(rg.chrom, rg.start, rg.end) for rg in chunkL] == \
+        [('chr1', 0, 9), ('chr1', 10, 19), ('chr1', 20, 24), ('chr2', 2, 3)]
+
+
+def test_get_regions(bamFnM):
+    rgL = bam.get_regions(bamFnM[0][0])
+    assert [(rg.chrom, rg.start, rg.end) for rg in rgL] == \
+        [('chr1', 0, 29), ('chr2', 0, 9)]
+
+
+@pytest.mark.parametrize('minMQ', [0, 20])
+def test_count_region(bamFnM, minMQ):
+    (rg, cA) = bam.count_region(sb.Region('chr1', 1, 30), bamFnM,
+                                minBQ=13, minMQ=minMQ)
+    assert cA.shape == (30, 2, 4)
+    assert (cA == get_expected_counts('chr1', 13, minMQ)).all()
+    # Position 1: A of the first population; the duplicate is ignored.
+    assert cA[0].tolist() == [[1, 0, 0, 0], [0, 0, 0, 0]]
+    # Position 10: C of the first read, C of the second read and T of
+    # the third read (if its mapping quality passes).
+    assert cA[9, 0].tolist() == [0, 2, 0, int(minMQ <= 10)]
+    # Region within a chunk.
+    (rg, cA) = bam.count_region(sb.Region('chr1', 3, 4), bamFnM)
+    assert cA.tolist() == [[[0, 0, 1, 0], [1, 0, 0, 0]],
+                           [[0, 0, 0, 1], [1, 0, 0, 0]]]
+
+
+@pytest.mark.parametrize('nProc', [1, 2])
+def test_bam_to_cf(bamFnM, tmp_path, nProc):
+    fn = str(tmp_path / 'test.cf')
+    bam.bam_to_cf(bamFnM, fn, nProc=nProc, chunkSize=7)
+    (nameL, chromA, posA, cA) = cf.read_cf_array(fn, positions=True)
+    assert nameL == ['pop0', 'pop1']
+    assert chromA.tolist() == ['chr1'] * 30 + ['chr2'] * 10
+    assert posA.tolist() == list(range(1, 31)) + list(range(1, 11))
+    expA = np.concatenate([get_expected_counts('chr1', 13, 0),
+                           get_expected_counts('chr2', 13, 0)])
+    assert (cA == expA).all()
+
+
+def test_bam_to_cf_skip_empty(bamFnM, tmp_path):
+    fn = str(tmp_path / 'test.cf')
+    bam.bam_to_cf(bamFnM, fn, rgL=[sb.Region('chr2', 1, 10)],
+                  nameL=['a', 'b'], skipEmpty=True)
+    (nameL, chromA, posA, cA) = cf.read_cf_array(fn, positions=True)
+    assert nameL == ['a', 'b']
+    assert posA.tolist() == [4, 5, 6, 7]
+    assert cA[:, 1].tolist() == [[0, 0, 0, 1], [0, 0, 1, 0],
+                                 [0, 1, 0, 0], [1, 0, 0, 0]]
+
+
+@pytest.mark.parametrize('nProc', [1, 2])
+def test_bam_to_cf_error(bamFnM, tmp_path, nProc):
+    fn = str(tmp_path / 'test.cf')
+    rgL = [sb.Region('chr1', 1, 30), sb.Region('chrUnknown', 1, 10)]
+    # pysam raises a KeyError for unknown chromosomes.
+    with pytest.raises(KeyError):
+        bam.bam_to_cf(bamFnM, fn, rgL=rgL, nProc=nProc, chunkSize=10)
+    # The workers are stopped and the counts file is closed.
+    assert multiprocessing.active_children() == []
+    assert sorted(os.listdir(str(tmp_path))) == \
+        ['pop0.bam', 'pop0.bam.bai', 'pop1.bam', 'pop1.bam.bai', 'test.cf']
+    with open(fn) as fo:
+        assert fo.readline().startswith('COUNTSFILE NPOP 2 NSITES')
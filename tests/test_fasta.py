@@ -0,0 +1,70 @@
+"""Tests for :mod:`cflib.fasta`."""
+
+import pytest
+
+import cflib.fasta as fa
+import cflib.seqbase as sb
+
+ref = 'ATGAAACCCGGGTTTAAACCCGGGTTTTAA'
+# Same start and stop codons, 10 of 30 bases differ.
+diverged = 'ATGCCCAAATTTGGGAAACCCGGGTTTTAA'
+
+
+def get_mfa_stream(tmp_path, seqL):
+    fn = str(tmp_path / 'test.fa')
+    with open(fn, 'w') as fo:
+        for (i, data) in enumerate(seqL):
+            fo.write('>CCDS1.1_sp' + str(i) + '_1_1 30 0 0 chr1:1-30+\n')
+            fo.write(data + '\n')
+        fo.write('\n')
+    return fa.MFaStream(fn)
+
+
+def test_filter_mfa_str(tmp_path):
+    mfa = get_mfa_stream(tmp_path, [ref, ref.lower()])
+    fp = fa.MFaStrFilterProps(2)
+    assert fa.filter_mfa_str(mfa, fp) is True
+    mfa.close()
+
+
+def test_filter_mfa_str_divergence(tmp_path, capsys):
+    mfa = get_mfa_stream(tmp_path, [ref, diverged])
+    fp = fa.MFaStrFilterProps(2)
+    # Rejected independently of the verbosity.
+    assert fa.filter_mfa_str(mfa, fp) is False
+    assert capsys.readouterr().out == ''
+    assert fa.filter_mfa_str(mfa, fp, verb=1) is False
+    assert 'too diverged' in capsys.readouterr().out
+    fp.maxDiv = 0.5
+    assert fa.filter_mfa_str(mfa, fp) is True
+    mfa.close()
+
+
+def test_filter_mfa_str_rejection_order(tmp_path, capsys):
+    # Too short and too diverged; the cheaper exon length filter is
+    # applied first and gives the rejection reason.
+    mfa = get_mfa_stream(tmp_path, [ref, diverged])
+    fp = fa.MFaStrFilterProps(2)
+    fp.minExonLen = 31
+    assert fa.filter_mfa_str(mfa, fp, verb=1) is False
+    assert capsys.readouterr().out == \
+        'CCDS1.1_sp0_1_1 rejection; Exon is too short.\n'
+    mfa.close()
+
+
+def test_save_as_vcf(tmp_path):
+    fn = str(tmp_path / 'test.fa')
+    with open(fn, 'w') as fo:
+        fo.write('>ref\nACGTACGT\n>a\nACGAACGT\n>b\nTCGTACGG\n')
+    faSeq = fa.open_seq(fn)
+    ref = faSeq.get_seq_by_id(0)
+    outFN = str(tmp_path / 'test.vcf')
+    # Variable columns in different chunks.
+    fa.save_as_vcf(faSeq, ref, outFN, batchSize=3)
+    with open(outFN) as fo:
+        lnL = fo.read().splitlines()
+    assert lnL[1:] == ['ref\t1\t.\tA\tT\t.\t.\t.\tGT\t0\t0\t1',
+                       'ref\t4\t.\tT\tA\t.\t.\t.\tGT\t0\t1\t0',
+                       'ref\t8\t.\tT\tG\t.\t.\t.\tGT\t0\t0\t1']
+    with pytest.raises(sb.SequenceDataError):
+        fa.save_as_vcf(faSeq, ref, outFN, bgzip=True)
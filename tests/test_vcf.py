@@ -0,0 +1,126 @@
+"""Tests for :mod:`cflib.vcf`."""
+
+import gc
+import sys
+import tracemalloc
+
+import pytest
+
+import cflib.vcf as vcf
+
+nSamples = 10
+# A long INFO field so that keeping it in memory can be detected.
+infoStr = 'DP=100;' + 'X=' + 'a' * 2000
+
+
+def get_line(pos):
+    smpL = ['0/1:12:99'] * nSamples
+    return '\t'.join(['chr1', str(pos), 'rs' + str(pos), 'A', 'C', '50',
+                      'PASS', infoStr, 'GT:DP:GQ'] + smpL) + '\n'
+
+
+def get_size(base):
+    """Return the memory used by *base* and the objects it references."""
+    size = sys.getsizeof(base)
+    for obj in gc.get_referents(base):
+        if obj is type(base):
+            continue
+        size += sys.getsizeof(obj)
+        if isinstance(obj, list):
+            size += sum(sys.getsizeof(o) for o in obj)
+    return size
+
+
+def write_vcf(fn, nLines):
+    with open(fn, 'w') as fo:
+        fo.write('##fileformat=VCFv4.1\n')
+        fo.write(vcf.get_header_line_string(
+            ['s' + str(i) for i in range(nSamples)]) + '\n')
+        for pos in range(1, nLines + 1):
+            fo.write(get_line(pos))
+
+
+def test_nuc_base_fields():
+    base = vcf.get_nuc_base_from_line(get_line(5), info=True)
+    assert (base.chrom, base.pos) == ('chr1', 5)
+    assert (base.id, base.ref, base.alt) == ('rs5', 'A', 'C')
+    assert (base.qual, base.filter, base.info) == ('50', 'PASS', infoStr)
+    assert base.format == 'GT:DP:GQ'
+    assert base.speciesData == ['0/1:12:99'] * nSamples
+
+
+def test_nuc_base_info_false():
+    base = vcf.get_nuc_base_from_line(get_line(5), info=False)
+    assert (base.ref, base.alt, base.format) == ('A', 'C', 'GT:DP:GQ')
+    assert (base.id, base.qual, base.filter, base.info) == ('', '', '', '')
+    # INFO is not kept, not even before the samples are decoded.
+    assert get_size(base) < len(infoStr)
+
+
+def test_nuc_base_drops_raw_line():
+    base = vcf.get_nuc_base_from_line(get_line(5), info=True)
+    lazySize = get_size(base)
+    base.ref
+    base.speciesData
+    assert base.get_raw_samples() is None
+    # Only the decoded fields are kept, not the raw line next to them.
+    assert get_size(base) < lazySize + nSamples * 100
+
+
+def test_vcf_seq_memory(tmp_path):
+    nLines = 1000
+    fn = str(tmp_path / 'test.vcf')
+    write_vcf(fn, nLines)
+    tracemalloc.start()
+    try:
+        seq = vcf.open_seq(fn)
+        for base in seq.baseL:
+            base.ref
+            base.alt
+            base.speciesData
+        used = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    assert seq.nBases == nLines
+    # The INFO fields alone would need more than half of this.
+    assert used < nLines * len(infoStr) / 2
+
+
+def test_allele_array():
+    alleleL = ['A', 'ACGTACGTACGTACGT', '', 'C,T']
+    alleleA = vcf.AlleleArray(alleleL)
+    assert len(alleleA) == 4
+    assert alleleA[1] == b'ACGTACGTACGTACGT'
+    assert alleleA[-1] == b'C,T'
+    assert alleleA.tolist() == [a.encode() for a in alleleL]
+    # A long allele does not widen the storage of the others.
+    assert len(alleleA.data) == sum(len(a) for a in alleleL)
+    both = vcf.concatenate_alleles([alleleA, vcf.AlleleArray(['G'])])
+    assert both.tolist() == [a.encode() for a in alleleL + ['G']]
+
+
+def test_vcf_col_seq(tmp_path):
+    fn = str(tmp_path / 'test.vcf')
+    write_vcf(fn, 3)
+    with open(fn, 'a') as fo:
+        fo.write(get_line(4).replace('\tA\tC\t', '\tA\tACGTACGTACGT\t'))
+    seq = vcf.open_seq(fn, columnar=True, blockSize=2)
+    assert seq.nBases == 4
+    assert seq.altA.tolist() == [b'C'] * 3 + [b'ACGTACGTACGT']
+    base = seq.get_nuc_base('chr1', 4)
+    assert (base.ref, base.alt) == ('A', 'ACGTACGTACGT')
+    assert base.get_speciesData() == [[0, 1]] * nSamples
+
+
+def test_gt_matrix():
+    gtM = vcf.get_gt_matrix(['0/1:3\t1|1:5', './.\t127/0'], 2, 2)
+    assert gtM.tolist() == [[[0, 1], [1, 1]], [[-1, -1], [127, 0]]]
+    # Mixed ploidy.
+    gtM = vcf.get_gt_matrix(['0/1\t1', '2/0\t0/0'], 2, 2)
+    assert gtM.tolist() == [[[0, 1], [1, -1]], [[2, 0], [0, 0]]]
+
+
+def test_gt_matrix_overflow():
+    for smpL in (['0/1\t128/0'], ['0/1\t1/300/1']):
+        with pytest.raises(vcf.NotANucBaseError):
+            vcf.get_gt_matrix(smpL, 2, 2)